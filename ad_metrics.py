@@ -0,0 +1,81 @@
+# -*- coding: utf-8 -*-
+"""
+소재별 집계 지표 레코드 + 저효율 소재 분류기
+"""
+
+from dataclasses import asdict, dataclass, field
+
+
+@dataclass
+class AdMetrics:
+    """소재명 + 타입 기준 D7 집계 지표 (df_grouped 한 행)"""
+
+    __slots__ = (
+        'ad_name', 'material_type', 'spend', 'purchases', 'registrations',
+        'revenue', 'roas', 'cpa_purchase', 'cpa_registration',
+    )
+
+    ad_name: str
+    material_type: str
+    spend: float
+    purchases: float
+    registrations: float
+    revenue: float
+    roas: float
+    cpa_purchase: float
+    cpa_registration: float
+
+    @classmethod
+    def from_frame(cls, df):
+        """DataFrame → AdMetrics 리스트 (to_dict('records') 없이 컬럼 단위로 변환)"""
+        if df.empty:
+            return []
+        columns = [df[name].tolist() for name in cls.__slots__]
+        return [cls(*values) for values in zip(*columns)]
+
+    def to_dict(self):
+        return asdict(self)
+
+
+@dataclass
+class LowPerformerBuckets:
+    """저효율 소재 유형별 분류 결과"""
+
+    zero_purchase: list = field(default_factory=list)           # 구매 0건
+    reg_only: list = field(default_factory=list)                # 구매 0건 + 가입 발생
+    no_conversion: list = field(default_factory=list)           # 구매·가입 모두 0건
+    low_roas_with_purchase: list = field(default_factory=list)  # 구매 발생 but ROAS 미달
+    total_spend: float = 0
+    zero_purchase_spend: float = 0
+    reg_cpa_sum: float = 0
+    reg_cpa_count: int = 0
+
+    @property
+    def total_count(self):
+        return len(self.zero_purchase) + len(self.low_roas_with_purchase)
+
+    @property
+    def avg_reg_cpa(self):
+        """가입만 발생한 소재의 평균 가입CPA (CPA 0 제외)"""
+        return self.reg_cpa_sum / self.reg_cpa_count if self.reg_cpa_count else 0
+
+
+def classify_low_performers(low_list):
+    """저효율 소재를 한 번 순회하며 유형별로 분류하고 지출 합계를 계산"""
+    buckets = LowPerformerBuckets()
+    for m in low_list:
+        buckets.total_spend += m.spend
+        if m.purchases > 0:
+            buckets.low_roas_with_purchase.append(m)
+            continue
+
+        buckets.zero_purchase.append(m)
+        buckets.zero_purchase_spend += m.spend
+        if m.registrations > 0:
+            buckets.reg_only.append(m)
+            if m.cpa_registration > 0:
+                buckets.reg_cpa_sum += m.cpa_registration
+                buckets.reg_cpa_count += 1
+        else:
+            buckets.no_conversion.append(m)
+    return buckets
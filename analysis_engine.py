@@ -6,61 +6,67 @@
 import json
 import time
 
-from facebook_business.api import FacebookAdsApi
-from facebook_business.exceptions import FacebookRequestError
 from facebook_business.adobjects.adaccount import AdAccount
-from facebook_business.adobjects.campaign import Campaign
-from facebook_business.adobjects.adset import AdSet
 import pandas as pd
 from datetime import datetime, timedelta
 
+from ad_metrics import AdMetrics, classify_low_performers
+from budget_simulator import OFF_POLICY_LABELS, simulate_reallocation
+from campaign_resolver import resolve_active_inventory
+from insights_fetcher import fetch_insights
+from inventory_crawler import DEFAULT_CONCURRENCY
+from meta_api import init_client_api
+from metrics import ANALYSIS_CPU, ROWS_FETCHED
+from report_renderer import format_money, format_metrics, render_report
+
 # 액션 타입 (레거시 + 표준 둘 다 체크)
 PURCHASE_ACTION_TYPES = ['offsite_conversion.fb_pixel_purchase', 'purchase']
 REGISTRATION_ACTION_TYPES = ['offsite_conversion.fb_pixel_complete_registration', 'complete_registration']
 
 
-def api_call_with_retry(func, max_retries=5, initial_wait=60, progress_callback=None):
-    """API 호출 시 rate limit 에러 발생하면 자동 재시도"""
-    for attempt in range(max_retries):
-        try:
-            return func()
-        except FacebookRequestError as e:
-            if e.api_error_code() == 17:
-                wait = initial_wait * (2 ** attempt)
-                if progress_callback:
-                    progress_callback(f"API 한도 초과. {wait}초 대기 후 재시도... ({attempt+1}/{max_retries})")
-                time.sleep(wait)
-            else:
-                raise
-    raise Exception(f"API 호출 {max_retries}회 재시도 후에도 실패")
-
-
-def format_money(amount):
-    """금액을 만원 단위로 포맷팅"""
-    if amount >= 10000:
-        return f"{amount/10000:.1f}만원"
-    else:
-        return f"{int(amount)}원"
+def get_purchase_revenue(action_values):
+    """action_values에서 구매 매출 추출 (표준 purchase 우선, 없으면 픽셀 레거시)"""
+    rev_values = {}
+    for av in action_values:
+        at = av['action_type']
+        if at in PURCHASE_ACTION_TYPES:
+            rev_values[at] = float(av.get('value', 0))
+    return rev_values.get('purchase',
+           rev_values.get('offsite_conversion.fb_pixel_purchase', 0))
+
+
+def get_reference_time(config):
+    """분석 기준 시각 (config의 as_of, 없으면 현재 시각)"""
+    as_of = config.get('as_of')
+    return datetime.fromisoformat(as_of) if as_of else datetime.now()
+
+
+def get_analysis_window(now=None):
+    """분석 기간 (최근 7일, 오늘 제외) → (start_date, end_date)"""
+    now = now or datetime.now()
+    end_date = now.replace(hour=0, minute=0, second=0, microsecond=0) - timedelta(days=1)
+    start_date = end_date - timedelta(days=6)
+    return start_date, end_date
 
 
-def generate_expert_analysis(da_low_list, va_low_list, df_all):
-    """30년차 그로스 마케터 관점의 종합 분석 의견 생성"""
+def generate_expert_analysis(da_low_list, va_low_list, df_all, plan=None):
+    """30년차 그로스 마케터 관점의 종합 분석 의견 생성 (plan: 예산 재배치 시뮬레이션 결과)"""
 
-    all_low = da_low_list + va_low_list
-    total_low_count = len(all_low)
+    buckets = classify_low_performers(da_low_list + va_low_list)
+    total_low_count = buckets.total_count
 
     if total_low_count == 0:
         return "전 소재 ROAS 85% 이상 유지 중. 현행 전략 유지하되, 신규 소재 테스트로 스케일업 여지를 탐색하세요."
 
-    total_low_spend = sum(m['spend'] for m in all_low)
+    total_low_spend = buckets.total_spend
     total_all_spend = float(df_all['spend'].sum())
     total_all_revenue = float(df_all['revenue'].sum())
     overall_roas = (total_all_revenue / total_all_spend * 100) if total_all_spend > 0 else 0
     low_spend_ratio = (total_low_spend / total_all_spend * 100) if total_all_spend > 0 else 0
 
-    zero_purchase = [m for m in all_low if m['purchases'] == 0]
-    has_reg_no_purchase = [m for m in all_low if m['purchases'] == 0 and m['registrations'] > 0]
-    low_roas_with_purchase = [m for m in all_low if m['purchases'] > 0]
+    zero_purchase = buckets.zero_purchase
+    has_reg_no_purchase = buckets.reg_only
+    low_roas_with_purchase = buckets.low_roas_with_purchase
 
     lines = []
 
@@ -71,100 +77,55 @@ def generate_expert_analysis(da_low_list, va_low_list, df_all):
 
     # 구매 전환 0건 분석
     if zero_purchase:
-        zero_spend = sum(m['spend'] for m in zero_purchase)
-        lines.append(f"▸ 구매 전환 0건 소재 {len(zero_purchase)}개에서 {format_money(zero_spend)}이 전환 없이 소진 중입니다. 크리에이티브 메시지 또는 타겟 자체에 문제가 있을 가능성이 높으므로 즉시 OFF를 권장합니다.")
+        lines.append(f"▸ 구매 전환 0건 소재 {len(zero_purchase)}개에서 {format_money(buckets.zero_purchase_spend)}이 전환 없이 소진 중입니다. 크리에이티브 메시지 또는 타겟 자체에 문제가 있을 가능성이 높으므로 즉시 OFF를 권장합니다.")
 
     # 퍼널 누수 분석
     if has_reg_no_purchase:
-        reg_cpas = [m['cpa_registration'] for m in has_reg_no_purchase if m['cpa_registration'] > 0]
-        avg_cpa = sum(reg_cpas) / len(reg_cpas) if reg_cpas else 0
-        lines.append(f"▸ 회원가입은 발생하나 구매 미전환 소재 {len(has_reg_no_purchase)}개(평균 가입CPA {format_money(avg_cpa)}): 후킹은 작동하나 구매 전환 퍼널에서 이탈 중. 랜딩페이지 CTA 및 결제 동선 점검, 소재 메시지와 실제 상품 간 기대값 불일치 여부를 확인하세요.")
+        lines.append(f"▸ 회원가입은 발생하나 구매 미전환 소재 {len(has_reg_no_purchase)}개(평균 가입CPA {format_money(buckets.avg_reg_cpa)}): 후킹은 작동하나 구매 전환 퍼널에서 이탈 중. 랜딩페이지 CTA 및 결제 동선 점검, 소재 메시지와 실제 상품 간 기대값 불일치 여부를 확인하세요.")
 
     # ROAS 미달이지만 구매 발생 소재
     if low_roas_with_purchase:
         for m in low_roas_with_purchase:
-            lines.append(f"▸ {m['ad_name']}: 구매 {int(m['purchases'])}건(ROAS {int(m['roas'])}%)으로 전환은 발생하나 효율 미달. 타겟 세분화 또는 입찰 조정 후 3일 모니터링 권장.")
+            lines.append(f"▸ {m.ad_name}: 구매 {int(m.purchases)}건(ROAS {int(m.roas)}%)으로 전환은 발생하나 효율 미달. 타겟 세분화 또는 입찰 조정 후 3일 모니터링 권장.")
 
     lines.append("")
 
     # 액션 플랜
     lines.append("**권장 액션 플랜:**")
     action_num = 1
-    if zero_purchase:
-        no_reg = [m for m in zero_purchase if m['registrations'] == 0]
-        if no_reg:
-            lines.append(f"{action_num}. 구매·가입 모두 0건 소재 {len(no_reg)}개 → 즉시 OFF (회생 가능성 없음)")
-            action_num += 1
+    if buckets.no_conversion:
+        lines.append(f"{action_num}. 구매·가입 모두 0건 소재 {len(buckets.no_conversion)}개 → 즉시 OFF (회생 가능성 없음)")
+        action_num += 1
     if has_reg_no_purchase:
         lines.append(f"{action_num}. 가입만 발생 소재 {len(has_reg_no_purchase)}개 → CPA 효율 최상위 1~2개만 존속 검토, 나머지 OFF")
         action_num += 1
     if low_roas_with_purchase:
         lines.append(f"{action_num}. ROAS 미달 but 전환 발생 소재 {len(low_roas_with_purchase)}개 → 타겟/입찰 최적화 후 3일 관찰, 미개선 시 OFF")
         action_num += 1
-    lines.append(f"{action_num}. 확보 예산({format_money(total_low_spend)}) → ROAS 상위 소재 스케일업에 재배치")
+    if plan is None or not plan.targets:
+        lines.append(f"{action_num}. 확보 예산({format_money(total_low_spend)}) → ROAS 상위 소재 스케일업에 재배치")
+    else:
+        change = plan.projected_revenue - plan.baseline_revenue
+        lines.append(
+            f"{action_num}. 확보 예산({format_money(plan.freed_spend)}, {OFF_POLICY_LABELS[plan.off_policy]}) 중 "
+            f"{format_money(plan.reallocated_spend)} → ROAS 상위 소재 {len(plan.targets)}개 스케일업에 재배치 "
+            f"(예상 ROAS {int(plan.baseline_roas)}% → {int(plan.projected_roas)}%, "
+            f"예상 매출 {'+' if change >= 0 else '-'}{format_money(abs(change))})"
+        )
+        for ad_name, material_type, current, proposed in plan.targets[:3]:
+            lines.append(f"   - [{material_type}] {ad_name}: {format_money(current)} → {format_money(proposed)}")
 
     return "\n".join(lines)
 
 
 def build_report_text(client_name, analysis_period, da_low_list, va_low_list, expert_analysis):
-    """보고서 텍스트 생성"""
-
-    report = f"""🚀 **{client_name} 주간 소재 성과 분석 리포트**
-
-**분석기간: {analysis_period}**
-
-━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
-
-**1. DA**
-
-"""
-
-    if da_low_list:
-        for idx, m in enumerate(da_low_list, 1):
-            report += f"{idx}) {m['ad_name']}\n"
-            report += format_material_line(m)
-            report += "\n"
-    else:
-        report += "(저효율 소재 없음)\n\n"
-
-    report += """**2. VA**
-
-"""
-
-    if va_low_list:
-        for idx, m in enumerate(va_low_list, 1):
-            report += f"{idx}) {m['ad_name']}\n"
-            report += format_material_line(m)
-            report += "\n"
-    else:
-        report += "(저효율 소재 없음)\n\n"
-
-    report += f"""━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
-
-💡 **종합 분석 의견**
-
-{expert_analysis}
-"""
-
-    return report
+    """보고서 텍스트 생성 (Discord 마크다운)"""
+    return render_report(client_name, analysis_period, da_low_list, va_low_list, expert_analysis, fmt='discord')
 
 
 def format_material_line(m):
     """소재별 지표 라인 포맷팅"""
-    parts = [f"{format_money(m['spend'])} 지출"]
-
-    if m['purchases'] > 0:
-        parts.append(f"매출 {format_money(m['revenue'])}")
-        parts.append(f"구매 {int(m['purchases'])}건")
-        parts.append(f"ROAS: {int(m['roas'])}%")
-        parts.append(f"구매CPA: {format_money(m['cpa_purchase'])}")
-    else:
-        parts.append("구매 미발생")
-
-    if m['registrations'] > 0:
-        parts.append(f"회원가입CPA: {format_money(m['cpa_registration'])}")
-
-    return "- " + " / ".join(parts) + "\n"
+    return "- " + format_metrics(m) + "\n"
 
 
 def analyze_meta_ads(config, progress_callback=None):
@@ -172,35 +133,43 @@ def analyze_meta_ads(config, progress_callback=None):
     메타 광고 데이터 분석 (계정 레벨 일괄 조회)
 
     config keys:
-        client_name, access_token, ad_account_id, target_campaigns,
-        min_spend, low_roas_threshold, budget_rule_pct
+        client_name, access_token (또는 access_tokens 토큰 풀), ad_account_id, target_campaigns,
+        min_spend, low_roas_threshold, budget_rule_pct, crawl_concurrency,
+        insights_shard ('day' / 'campaign' / 'day,campaign', 기본: 단일 호출),
+        as_of (분석 기준 시각 ISO 문자열, 기본: 현재 시각)
 
     returns:
         { report_text, da_low, va_low, expert_analysis, debug_info }
     """
+    started = time.process_time()
+    try:
+        return _analyze_meta_ads(config, progress_callback)
+    finally:
+        ANALYSIS_CPU.inc(time.process_time() - started)
+
+
+def _analyze_meta_ads(config, progress_callback):
 
     def log(msg):
         if progress_callback:
             progress_callback(msg)
 
-    access_token = config['access_token']
     ad_account_id = config['ad_account_id']
-    target_campaigns = config['target_campaigns']
     min_spend_total = config.get('min_spend', 250000)
     low_roas_threshold = config.get('low_roas_threshold', 85)
     budget_rule_pct = config.get('budget_rule_pct', 50)
     client_name = config.get('client_name', '광고주')
 
     # API 초기화
-    FacebookAdsApi.init(access_token=access_token)
+    init_client_api(config)
 
     log("메타 광고 데이터 수집 중...")
 
     account = AdAccount(ad_account_id)
 
     # 날짜 범위 설정 (최근 7일, 오늘 제외)
-    end_date = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0) - timedelta(days=1)
-    start_date = end_date - timedelta(days=6)
+    now = get_reference_time(config)
+    start_date, end_date = get_analysis_window(now)
     date_range = {
         'since': start_date.strftime('%Y-%m-%d'),
         'until': end_date.strftime('%Y-%m-%d')
@@ -211,18 +180,14 @@ def analyze_meta_ads(config, progress_callback=None):
 
     log(f"분석기간: {analysis_period}")
 
-    # 1단계: 타겟 캠페인 ID 조회
+    # 1단계: 타겟 캠페인 ID 조회 (서버 측 필터 + 캐시) + 광고세트/소재 크롤링
     log("활성 타겟 캠페인 검색 중...")
-    campaigns = api_call_with_retry(
-        lambda: list(account.get_campaigns(fields=['name', 'id', 'effective_status'])),
-        progress_callback=progress_callback
-    )
+    campaigns, inventory = resolve_active_inventory(account, config, progress_callback)
 
     target_campaign_ids = []
-    for campaign in campaigns:
-        if campaign['name'] in target_campaigns and campaign.get('effective_status') == 'ACTIVE':
-            target_campaign_ids.append(campaign['id'])
-            log(f"활성 캠페인: {campaign['name']}")
+    for cid, cname in campaigns:
+        target_campaign_ids.append(cid)
+        log(f"활성 캠페인: {cname}")
 
     if not target_campaign_ids:
         return {
@@ -237,88 +202,44 @@ def analyze_meta_ads(config, progress_callback=None):
     # 2단계: 인사이트 일괄 조회
     log("광고 데이터 일괄 수집 중...")
 
-    raw_insights = api_call_with_retry(
-        lambda: list(account.get_insights(
-            fields=[
-                'ad_id',
-                'ad_name',
-                'adset_name',
-                'campaign_name',
-                'spend',
-                'actions',
-                'action_values'
-            ],
-            params={
-                'level': 'ad',
-                'time_range': date_range,
-                'filtering': [
-                    {
-                        'field': 'campaign.id',
-                        'operator': 'IN',
-                        'value': target_campaign_ids
-                    }
-                ],
-                'limit': 500
-            }
-        )),
-        progress_callback=progress_callback
+    raw_insights = fetch_insights(
+        account,
+        ['ad_id', 'ad_name', 'adset_name', 'campaign_name', 'spend', 'actions', 'action_values'],
+        date_range,
+        target_campaign_ids,
+        shard_mode=config.get('insights_shard'),
+        max_workers=config.get('crawl_concurrency', DEFAULT_CONCURRENCY),
+        progress_callback=progress_callback,
+        extra_params={'time_increment': 1}
     )
 
+    ROWS_FETCHED.inc(len(raw_insights), kind='insights')
     log(f"{len(raw_insights)}개 광고 인사이트 수집 완료")
 
     # 2-b단계: 광고세트 예산 + 광고 상태 + 오늘 지출 조회
     log("광고 상태 및 규칙OFF 자동 감지 중...")
 
-    today_str = datetime.now().strftime('%Y-%m-%d')
+    today_str = now.strftime('%Y-%m-%d')
     today_range = {'since': today_str, 'until': today_str}
 
     adset_budgets = {}
     ad_status_map = {}
 
-    for cid in target_campaign_ids:
-        campaign_obj = Campaign(cid)
-        adsets = api_call_with_retry(
-            lambda c=campaign_obj: list(c.get_ad_sets(
-                fields=['id', 'name', 'effective_status', 'daily_budget']
-            )),
-            progress_callback=progress_callback
-        )
-        time.sleep(1)
-        for adset in adsets:
-            if adset.get('effective_status') != 'ACTIVE':
-                continue
+    for campaign_entry in inventory:
+        for entry in campaign_entry['adsets']:
+            adset = entry['adset']
             adset_budgets[adset['id']] = int(adset.get('daily_budget', 0))
-            adset_obj = AdSet(adset['id'])
-            ads = api_call_with_retry(
-                lambda a=adset_obj: list(a.get_ads(
-                    fields=['id', 'name', 'effective_status']
-                )),
-                progress_callback=progress_callback
-            )
-            time.sleep(1)
-            for ad in ads:
+            for ad in entry['ads']:
                 ad_status_map[(ad['name'], adset['id'])] = ad.get('effective_status', '')
 
     # 오늘 광고별 지출 조회
-    today_insights = api_call_with_retry(
-        lambda: list(account.get_insights(
-            fields=['ad_name', 'adset_id', 'spend'],
-            params={
-                'level': 'ad',
-                'time_range': today_range,
-                'filtering': [
-                    {
-                        'field': 'campaign.id',
-                        'operator': 'IN',
-                        'value': target_campaign_ids
-                    }
-                ],
-                'limit': 500
-            }
-        )),
+    today_insights = fetch_insights(
+        account, ['ad_name', 'adset_id', 'spend'], today_range, target_campaign_ids,
         progress_callback=progress_callback
     )
 
+    ROWS_FETCHED.inc(len(today_insights), kind='today')
+
     today_spend_map = {}
     for ti in today_insights:
         key = (ti.get('ad_name', ''), ti.get('adset_id', ''))
@@ -379,15 +300,12 @@ def analyze_meta_ads(config, progress_callback=None):
                             reg_counts.get('offsite_conversion.fb_pixel_complete_registration', 0))
 
         if 'action_values' in insight:
-            rev_values = {}
-            for av in insight['action_values']:
-                at = av['action_type']
-                if at in PURCHASE_ACTION_TYPES:
-                    rev_values[at] = get_action_value(av)
-            revenue = rev_values.get('purchase',
-                      rev_values.get('offsite_conversion.fb_pixel_purchase', 0))
+            revenue = get_purchase_revenue(insight['action_values'])
 
         all_ads_data.append({
+            'date_start': insight.get('date_start', ''),
+            'campaign_name': insight.get('campaign_name', ''),
+            'ad_id': insight.get('ad_id', ''),
             'ad_name': ad_name,
             'adset_name': adset_name,
             'material_type': material_type,
@@ -409,7 +327,7 @@ def analyze_meta_ads(config, progress_callback=None):
 
     # 4단계: 소재명 + 타입 기준 통합 집계
     df = pd.DataFrame(all_ads_data)
-    log(f"지출 발생 광고: {len(df)}개 (수동OFF 제외: {excluded_count}개)")
+    log(f"지출 발생 광고: {df['ad_id'].nunique()}개 (일별 {len(df)}행, 수동OFF 제외: {excluded_count}행)")
 
     df_grouped = df.groupby(['ad_name', 'material_type']).agg({
         'spend': 'sum',
@@ -453,11 +371,19 @@ def analyze_meta_ads(config, progress_callback=None):
     da_low = low_performance[low_performance['material_type'] == 'DA']
     va_low = low_performance[low_performance['material_type'] == 'VA']
 
-    da_low_list = da_low.to_dict('records') if not da_low.empty else []
-    va_low_list = va_low.to_dict('records') if not va_low.empty else []
+    da_low_list = AdMetrics.from_frame(da_low)
+    va_low_list = AdMetrics.from_frame(va_low)
+
+    # 예산 재배치 시뮬레이션 (일별 실적 기반 수확체감 곡선)
+    plan = simulate_reallocation(df_grouped, da_low_list + va_low_list, df)
+    if plan is not None:
+        debug_lines.append(
+            f"[시뮬레이션] 시나리오 {plan.scenario_count}개 / 탄력성 {plan.elasticity:.2f} / "
+            f"{plan.elapsed * 1000:.0f}ms / 예상 ROAS {plan.baseline_roas:.0f}% → {plan.projected_roas:.0f}%"
+        )
 
     # 전문가 분석 의견 생성
-    expert_analysis = generate_expert_analysis(da_low_list, va_low_list, df_grouped)
+    expert_analysis = generate_expert_analysis(da_low_list, va_low_list, df_grouped, plan)
 
     # 보고서 텍스트 생성
     report_text = build_report_text(client_name, analysis_period, da_low_list, va_low_list, expert_analysis)
@@ -471,5 +397,8 @@ def analyze_meta_ads(config, progress_callback=None):
         'expert_analysis': expert_analysis,
         'debug_info': "\n".join(debug_lines),
         'analysis_period': analysis_period,
+        'client_name': client_name,
         'df_grouped': df_grouped,
+        'df_raw': df,
+        'reallocation': plan,
     }
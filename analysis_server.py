@@ -0,0 +1,175 @@
+# -*- coding: utf-8 -*-
+"""
+로컬 분석 HTTP 서비스 (analyze_meta_ads JSON API)
+
+사용법:
+  python analysis_server.py [--port 8765] [--ttl 600]
+
+엔드포인트:
+  GET /clients                       등록된 광고주 목록
+  GET /analyze?client=NAME           광고주 D7 분석 결과 (JSON)
+  GET /analyze?client=NAME&refresh=1 캐시 무시하고 재분석
+  GET /metrics                       운영 지표 (Prometheus 텍스트 포맷)
+
+같은 광고주·분석기간 요청이 동시에 들어오면 계산은 한 번만 수행하고 나머지 요청은
+그 결과를 함께 기다린다. 결과는 TTL 동안 메모리에 보관하고, run_report와 같은
+결과 캐시(.cache/results)도 같은 TTL 이내 결과만 재사용한다.
+SDK 기본 API 객체가 프로세스 전역이므로 서로 다른 광고주의 계산은 순차 실행한다.
+"""
+
+import json
+import sys
+import threading
+import time
+from concurrent.futures import Future
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+from metrics import CONTENT_TYPE, current_client, render
+from result_cache import DEFAULT_TTL, analyze_with_cache, cache_key
+from utils import option_from_argv
+
+DEFAULT_PORT = 8765
+DEFAULT_MEMORY_TTL = 10 * 60  # 10분
+
+
+def load_clients():
+    with open('clients.json', 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def result_to_json(result):
+    """분석 결과 dict → JSON 직렬화 가능한 dict"""
+    payload = {k: v for k, v in result.items() if k not in ('da_low', 'va_low', 'df_grouped', 'df_raw', 'reallocation')}
+    payload['da_low'] = [m.to_dict() for m in result.get('da_low', [])]
+    payload['va_low'] = [m.to_dict() for m in result.get('va_low', [])]
+    df = result.get('df_grouped')
+    payload['grouped'] = df.to_dict('records') if df is not None else []
+    plan = result.get('reallocation')
+    payload['reallocation'] = plan.to_dict() if plan is not None else None
+    return payload
+
+
+class AnalysisService:
+    """광고주·분석기간 단위 요청 병합 + TTL 메모리 캐시"""
+
+    def __init__(self, memory_ttl=DEFAULT_MEMORY_TTL):
+        self.memory_ttl = memory_ttl
+        self._lock = threading.Lock()
+        self._compute_lock = threading.Lock()
+        self._inflight = {}
+        self._cache = {}
+
+    def get(self, client_name, config, refresh=False):
+        """직렬화된 JSON 바이트 반환 (진행 중인 동일 요청이 있으면 그 결과를 공유)"""
+        config = dict(config, client_name=client_name)
+        key = cache_key(config)
+
+        with self._lock:
+            cached = self._cache.get(key)
+            if cached and not refresh and cached[0] > time.monotonic():
+                return cached[1]
+
+            future = self._inflight.get(key)
+            owner = future is None
+            if owner:
+                future = Future()
+                self._inflight[key] = future
+
+        if not owner:
+            return future.result()
+
+        try:
+            body = self._compute(client_name, config, refresh)
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(body)
+            return body
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+
+    def _compute(self, client_name, config, refresh):
+        with self._compute_lock:
+            current_client.set(client_name)
+            # 디스크 캐시도 메모리 TTL 이내 결과만 사용 (--ttl이 실제 최신성 기준이 되도록)
+            result = analyze_with_cache(config, use_cache=not refresh, ttl=min(self.memory_ttl, DEFAULT_TTL))
+        body = json.dumps(result_to_json(result), ensure_ascii=False, default=str).encode('utf-8')
+        if not result.get('error'):
+            with self._lock:
+                self._cache[cache_key(config)] = (time.monotonic() + self.memory_ttl, body)
+        return body
+
+
+class AnalysisHandler(BaseHTTPRequestHandler):
+    service = None
+
+    def _send(self, status, body, content_type='application/json; charset=utf-8'):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_json(self, status, payload):
+        self._send(status, json.dumps(payload, ensure_ascii=False).encode('utf-8'))
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        query = parse_qs(url.query)
+
+        if url.path == '/metrics':
+            self._send(200, render().encode('utf-8'), CONTENT_TYPE)
+            return
+
+        try:
+            clients = load_clients()
+        except (OSError, ValueError) as e:
+            self._send_json(500, {'error': f"clients.json 로드 실패: {e}"})
+            return
+
+        if url.path == '/clients':
+            self._send_json(200, {'clients': list(clients)})
+            return
+
+        if url.path != '/analyze':
+            self._send_json(404, {'error': '알 수 없는 경로입니다.'})
+            return
+
+        client_name = query.get('client', [''])[0]
+        if client_name not in clients:
+            self._send_json(404, {'error': f"등록되지 않은 광고주: {client_name}"})
+            return
+
+        refresh = query.get('refresh', ['0'])[0] in ('1', 'true')
+        try:
+            body = self.service.get(client_name, clients[client_name], refresh=refresh)
+        except Exception as e:
+            self._send_json(502, {'error': f"분석 실패: {e}"})
+            return
+        self._send(200, body)
+
+    def log_message(self, format, *args):
+        print(f"[{self.log_date_time_string()}] {format % args}")
+
+
+def main():
+    argv = sys.argv[1:]
+    port, argv = option_from_argv(argv, '--port')
+    ttl, argv = option_from_argv(argv, '--ttl')
+
+    AnalysisHandler.service = AnalysisService(memory_ttl=int(ttl) if ttl else DEFAULT_MEMORY_TTL)
+    server = ThreadingHTTPServer(('127.0.0.1', int(port) if port else DEFAULT_PORT), AnalysisHandler)
+    print(f"=== 분석 서비스 시작: http://127.0.0.1:{server.server_address[1]} ===")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == '__main__':
+    main()
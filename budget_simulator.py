@@ -0,0 +1,159 @@
+# -*- coding: utf-8 -*-
+"""
+저효율 소재 OFF 후 예산 재배치 시뮬레이션 (수확체감 곡선 + NumPy 벡터화 시나리오 평가)
+
+일별 인사이트(df_raw)로 소재별 매출 곡선 revenue = a · spend^b 를 적합한다.
+탄력성 b는 소재 간 공통값(소재별 평균을 뺀 로그-로그 회귀)으로 추정하고,
+일별 지출 변화가 작아 기울기가 잘 정해지지 않으면 DEFAULT_ELASTICITY 쪽으로 당긴다.
+b는 1 미만으로 제한한다 — 관측 구간의 ROAS가 일정해도 증액분까지 같은 효율이 난다고 보지 않는다.
+a는 각 소재의 D7 실적을 지나도록 맞추므로 지출을 m배 하면 예상 매출은 m^b배가 된다.
+
+시나리오 = (OFF 범위 × 스케일업 소재 수 N × ROAS 가중 지수) 조합이며,
+전 조합을 (시나리오 × 후보 소재) 배열 한 번으로 평가해 예상 매출이 가장 큰 안을 고른다.
+총 지출은 현재 수준을 넘지 않고, 소재별 증액은 MAX_SCALE배까지로 제한한다.
+"""
+
+import time
+from dataclasses import asdict, dataclass, field
+
+import numpy as np
+
+DEFAULT_ELASTICITY = 0.7
+ELASTICITY_BOUNDS = (0.2, 0.9)
+ELASTICITY_PRIOR_WEIGHT = 5.0   # 기본값으로 당기는 강도 (소재별 로그 지출 편차 제곱합 단위)
+MIN_FIT_POINTS = 10     # 탄력성 적합에 필요한 최소 (소재, 일자) 수
+MAX_SCALE = 3.0         # 소재별 최대 지출 배수
+MAX_TARGETS = 20        # 스케일업 후보 소재 수 (ROAS 상위)
+
+OFF_POLICIES = ('zero_purchase', 'all_low')
+OFF_POLICY_LABELS = {
+    'zero_purchase': '구매 0건 소재 OFF 기준',
+    'all_low': '저효율 소재 전체 OFF 기준',
+}
+WEIGHT_EXPONENTS = np.linspace(0.0, 4.0, 60)
+
+
+@dataclass
+class ReallocationPlan:
+    """최적 재배치안 (금액은 D7 기준)"""
+
+    off_policy: str
+    off_count: int
+    freed_spend: float
+    reallocated_spend: float
+    baseline_spend: float
+    baseline_revenue: float
+    projected_spend: float
+    projected_revenue: float
+    elasticity: float
+    scenario_count: int
+    elapsed: float
+    targets: list = field(default_factory=list)  # [(ad_name, material_type, 현재 지출, 제안 지출)] 증액 큰 순
+
+    @property
+    def baseline_roas(self):
+        return self.baseline_revenue / self.baseline_spend * 100 if self.baseline_spend > 0 else 0
+
+    @property
+    def projected_roas(self):
+        return self.projected_revenue / self.projected_spend * 100 if self.projected_spend > 0 else 0
+
+    def to_dict(self):
+        data = asdict(self)
+        data['baseline_roas'] = self.baseline_roas
+        data['projected_roas'] = self.projected_roas
+        return data
+
+
+def fit_elasticity(df_raw):
+    """일별 (소재, 일자) 지출·매출로 공통 탄력성 b 추정 (데이터 부족 시 기본값, 지출 변화가 작을수록 기본값 쪽)"""
+    if df_raw is None or df_raw.empty or 'date_start' not in df_raw:
+        return DEFAULT_ELASTICITY
+
+    daily = df_raw.groupby(['ad_name', 'material_type', 'date_start'])[['spend', 'revenue']].sum()
+    daily = daily[(daily['spend'] > 0) & (daily['revenue'] > 0)]
+    if len(daily) < MIN_FIT_POINTS:
+        return DEFAULT_ELASTICITY
+
+    logs = np.log(daily[['spend', 'revenue']])
+    centered = logs - logs.groupby(level=['ad_name', 'material_type']).transform('mean')
+    x = centered['spend'].to_numpy()
+    y = centered['revenue'].to_numpy()
+    sxx = float(x @ x)
+    if sxx < 1e-9:
+        return DEFAULT_ELASTICITY
+    b = (x @ y + ELASTICITY_PRIOR_WEIGHT * DEFAULT_ELASTICITY) / (sxx + ELASTICITY_PRIOR_WEIGHT)
+    return float(np.clip(b, *ELASTICITY_BOUNDS))
+
+
+def simulate_reallocation(df_grouped, low_list, df_raw=None):
+    """
+    저효율 소재 OFF + ROAS 상위 소재 증액 시나리오 평가
+
+    returns: 예상 매출이 가장 큰 ReallocationPlan (저효율 소재나 증액 후보가 없으면 None)
+    """
+    start = time.perf_counter()
+    if df_grouped is None or df_grouped.empty or not low_list:
+        return None
+
+    low_keys = {(m.ad_name, m.material_type) for m in low_list}
+    names = df_grouped['ad_name'].tolist()
+    types = df_grouped['material_type'].tolist()
+    spend = df_grouped['spend'].to_numpy(dtype=float)
+    revenue = df_grouped['revenue'].to_numpy(dtype=float)
+
+    is_low = np.fromiter(((n, t) in low_keys for n, t in zip(names, types)), dtype=bool, count=len(names))
+    zero_purchase = is_low & (df_grouped['purchases'].to_numpy() == 0)
+    off_masks = np.vstack([zero_purchase, is_low]).astype(float)  # P × 소재
+
+    candidates = np.flatnonzero(~is_low & (spend > 0) & (revenue > 0))
+    if len(candidates) == 0:
+        return None
+    order = candidates[np.argsort(-(revenue[candidates] / spend[candidates]), kind='stable')][:MAX_TARGETS]
+    c_spend = spend[order]
+    c_revenue = revenue[order]
+    c_roas = c_revenue / c_spend
+    k = len(order)
+
+    b = fit_elasticity(df_raw)
+    freed = off_masks @ spend    # P
+    lost = off_masks @ revenue   # P
+
+    # 가중치: (N, G, K) — 상위 N개 소재에 ROAS^γ 비례 배분
+    rank_mask = np.arange(k)[None, :] < np.arange(1, k + 1)[:, None]
+    preference = (c_roas / c_roas.max())[None, :] ** WEIGHT_EXPONENTS[:, None]
+    weights = rank_mask[:, None, :] * preference[None, :, :]
+    weights /= weights.sum(axis=-1, keepdims=True)
+
+    # 증액: (P, N, G, K), 소재별 MAX_SCALE배 상한 (초과분은 미집행)
+    extra = np.minimum(freed[:, None, None, None] * weights[None], c_spend * (MAX_SCALE - 1))
+    gain = (c_revenue * ((1 + extra / c_spend) ** b - 1)).sum(axis=-1)
+    added = extra.sum(axis=-1)
+
+    baseline_spend = float(spend.sum())
+    baseline_revenue = float(revenue.sum())
+    projected_revenue = baseline_revenue - lost[:, None, None] + gain
+    projected_spend = baseline_spend - freed[:, None, None] + added
+
+    p, n, g = np.unravel_index(np.argmax(projected_revenue), projected_revenue.shape)
+    best_extra = extra[p, n, g]
+    targets = [
+        (names[idx], types[idx], float(spend[idx]), float(spend[idx] + delta))
+        for idx, delta in sorted(zip(order, best_extra), key=lambda item: -item[1])
+        if delta > 0
+    ]
+
+    return ReallocationPlan(
+        off_policy=OFF_POLICIES[p],
+        off_count=int(off_masks[p].sum()),
+        freed_spend=float(freed[p]),
+        reallocated_spend=float(added[p, n, g]),
+        baseline_spend=baseline_spend,
+        baseline_revenue=baseline_revenue,
+        projected_spend=float(projected_spend[p, n, g]),
+        projected_revenue=float(projected_revenue[p, n, g]),
+        elasticity=b,
+        scenario_count=int(projected_revenue.size),
+        elapsed=time.perf_counter() - start,
+        targets=targets,
+    )
@@ -0,0 +1,131 @@
+# -*- coding: utf-8 -*-
+"""
+타겟 캠페인 ID 조회 (서버 측 필터 + 광고주별 단기 캐시)
+
+계정의 전체 캠페인을 페이지 단위로 훑지 않고 effective_status / name 필터를
+API에 넘겨 활성 타겟 캠페인만 받아온다. 조회 결과는 짧은 TTL로 캐시하고,
+캐시된 캠페인에서 활성 광고세트가 하나도 안 나오면(일시정지·삭제 등) 캐시를 버리고 다시 조회한다.
+"""
+
+import hashlib
+import json
+import os
+import time
+
+from facebook_business.exceptions import FacebookRequestError
+
+from inventory_crawler import DEFAULT_CONCURRENCY, crawl_inventory
+from meta_api import api_call_with_retry
+from utils import atomic_write
+
+CAMPAIGN_CACHE_PATH = os.environ.get('META_CAMPAIGN_CACHE_PATH', os.path.join('.cache', 'campaigns.json'))
+CAMPAIGN_CACHE_TTL = 10 * 60  # 10분
+
+CAMPAIGN_FIELDS = ['name', 'id', 'effective_status']
+
+
+def _client_key(config):
+    names = json.dumps(sorted(config['target_campaigns']), ensure_ascii=False)
+    digest = hashlib.sha256(names.encode('utf-8')).hexdigest()[:16]
+    return f"{config['ad_account_id']}_{digest}"
+
+
+def _load_cache():
+    try:
+        with open(CAMPAIGN_CACHE_PATH, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _save_cache(cache):
+    atomic_write(CAMPAIGN_CACHE_PATH, lambda f: json.dump(cache, f, ensure_ascii=False))
+
+
+def invalidate_campaign_cache(config):
+    """해당 광고주의 캐시된 캠페인 목록 삭제"""
+    cache = _load_cache()
+    if cache.pop(_client_key(config), None) is not None:
+        _save_cache(cache)
+
+
+def fetch_target_campaigns(account, target_names, progress_callback=None):
+    """활성 상태 + 이름 필터를 서버에 넘겨 타겟 캠페인 [(id, name)] 조회"""
+    target_names = list(target_names)
+    params = {
+        'effective_status': ['ACTIVE'],
+        'filtering': [{'field': 'name', 'operator': 'IN', 'value': target_names}],
+        'limit': max(len(target_names), 25),
+    }
+    try:
+        campaigns = api_call_with_retry(
+            lambda: list(account.get_campaigns(fields=CAMPAIGN_FIELDS, params=params)),
+            progress_callback=progress_callback
+        )
+    except FacebookRequestError as e:
+        if e.api_error_code() != 100:
+            raise
+        # 이름 필터 미지원 시 상태 필터만 서버에 적용
+        params.pop('filtering')
+        params['limit'] = 500
+        campaigns = api_call_with_retry(
+            lambda: list(account.get_campaigns(fields=CAMPAIGN_FIELDS, params=params)),
+            progress_callback=progress_callback
+        )
+
+    # 서버 필터는 부분 일치 가능성이 있어 정확한 이름으로 한 번 더 확인
+    names = set(target_names)
+    return [(c['id'], c['name']) for c in campaigns
+            if c['name'] in names and c.get('effective_status') == 'ACTIVE']
+
+
+def resolve_target_campaigns(account, config, progress_callback=None, use_cache=True):
+    """
+    타겟 캠페인 [(id, name)] 조회 (캐시 우선, config의 campaign_cache=False면 항상 조회)
+
+    returns: (campaigns, from_cache)
+    """
+    key = _client_key(config)
+    use_cache = use_cache and config.get('campaign_cache', True)
+    if use_cache:
+        entry = _load_cache().get(key)
+        if entry and time.time() - entry.get('fetched_at', 0) <= CAMPAIGN_CACHE_TTL:
+            return [tuple(c) for c in entry['campaigns']], True
+
+    campaigns = fetch_target_campaigns(account, config['target_campaigns'], progress_callback)
+
+    # 빈 결과는 캐시하지 않음 (다음 실행에서 다시 조회)
+    if campaigns and config.get('campaign_cache', True):
+        cache = _load_cache()
+        cache[key] = {'fetched_at': time.time(), 'campaigns': campaigns}
+        try:
+            _save_cache(cache)
+        except OSError:
+            pass
+    return campaigns, False
+
+
+def resolve_active_inventory(account, config, progress_callback=None):
+    """
+    타겟 캠페인 조회 + 광고세트/소재 크롤링
+
+    캐시된 캠페인 중 활성 광고세트가 없는 캠페인이 있으면 캐시 미스로 보고
+    캐시를 무효화한 뒤 최신 캠페인 목록으로 다시 크롤링한다.
+
+    returns: (campaigns [(id, name)], inventory)
+    """
+    max_workers = config.get('crawl_concurrency', DEFAULT_CONCURRENCY)
+
+    campaigns, from_cache = resolve_target_campaigns(account, config, progress_callback)
+    inventory = crawl_inventory([cid for cid, _ in campaigns], max_workers, progress_callback)
+
+    if from_cache and any(not entry['adsets'] for entry in inventory):
+        if progress_callback:
+            progress_callback("캐시된 캠페인 정보가 오래되어 다시 조회합니다.")
+        invalidate_campaign_cache(config)
+        fresh, _ = resolve_target_campaigns(account, config, progress_callback, use_cache=False)
+        if fresh != campaigns:
+            campaigns = fresh
+            inventory = crawl_inventory([cid for cid, _ in campaigns], max_workers, progress_callback)
+
+    return campaigns, inventory
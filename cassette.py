@@ -0,0 +1,157 @@
+# -*- coding: utf-8 -*-
+"""
+Graph API 요청/응답 녹화·재생 (facebook_business SDK call() 단위)
+
+녹화: 실제 호출의 요청(메서드, 경로, 파라미터)과 응답(상태, 헤더, 본문, 지연시간)을
+      gzip JSON Lines로 저장한다. access_token / appsecret_proof는 모두 가린다.
+재생: 네트워크 없이 녹화 파일에서 같은 요청의 응답을 순서대로 돌려준다.
+      replay_latency=True면 녹화 당시 지연시간만큼 기다려 실제와 비슷한 시간 특성을 재현한다.
+      녹화된 한도 초과 에러도 다시 발생하지만, 재시도 대기·토큰 격리는 하지 않고 바로 다음 응답으로 넘어간다.
+      요청 파라미터에 날짜가 들어가므로 재생 시에는 녹화 시각(recorded_at)을 분석 기준 시각으로 쓴다.
+
+사용법 (run_report.py / manage_rules.py 공통):
+  --record PATH           실행 중 모든 API 호출을 PATH(.jsonl.gz)에 녹화
+  --replay PATH           PATH의 녹화본으로 API 호출 대체 (토큰 불필요)
+  --replay-latency        재생 시 녹화된 지연시간 적용
+"""
+
+import gzip
+import json
+import re
+import threading
+import time
+from collections import defaultdict, deque
+from datetime import datetime
+
+from facebook_business.api import FacebookResponse
+
+REDACTED = 'REDACTED'
+SECRET_PARAMS = ('access_token', 'appsecret_proof')
+_SECRET_PATTERN = re.compile(r'(access_token|appsecret_proof)=[^&"\s]+')
+
+
+class CassetteMiss(Exception):
+    """재생 모드에서 녹화되지 않은 요청"""
+
+
+def _normalize_path(path):
+    if isinstance(path, (list, tuple)):
+        return '/'.join(str(p) for p in path)
+    return str(path)
+
+
+def _redact(text):
+    return _SECRET_PATTERN.sub(lambda m: f"{m.group(1)}={REDACTED}", text) if text else text
+
+
+def request_key(method, path, params):
+    """요청 식별 키 (비밀값 제외, 파라미터 정렬)"""
+    clean = {k: v for k, v in (params or {}).items() if k not in SECRET_PARAMS}
+    return json.dumps([method.upper(), _normalize_path(path), clean], sort_keys=True, default=str, ensure_ascii=False)
+
+
+class Cassette:
+    """녹화 파일 1개 (mode: 'record' / 'replay')"""
+
+    def __init__(self, path, mode, replay_latency=False):
+        if mode not in ('record', 'replay'):
+            raise ValueError(f"알 수 없는 cassette 모드: {mode}")
+        self.path = path
+        self.mode = mode
+        self.replay_latency = replay_latency
+        self._lock = threading.Lock()
+        self._entries = defaultdict(deque)
+        self._last = {}
+        self._file = None
+        self.recorded_at = None
+
+        if mode == 'record':
+            self.recorded_at = datetime.now().isoformat(timespec='seconds')
+            self._file = gzip.open(path, 'wt', encoding='utf-8')
+            self._file.write(json.dumps({'meta': {'recorded_at': self.recorded_at}}) + "\n")
+        else:
+            with gzip.open(path, 'rt', encoding='utf-8') as f:
+                for line in f:
+                    entry = json.loads(line)
+                    if 'meta' in entry:
+                        self.recorded_at = entry['meta'].get('recorded_at')
+                        continue
+                    self._entries[entry['key']].append(entry)
+
+    @property
+    def recording(self):
+        return self.mode == 'record'
+
+    def record(self, method, path, params, status, headers, body, latency):
+        entry = {
+            'key': request_key(method, path, params),
+            'status': status,
+            'headers': {k: _redact(str(v)) for k, v in dict(headers or {}).items()},
+            'body': _redact(body if isinstance(body, str) else json.dumps(body, ensure_ascii=False)),
+            'latency': round(latency, 4),
+        }
+        line = json.dumps(entry, ensure_ascii=False)
+        with self._lock:
+            self._file.write(line + "\n")
+
+    def replay(self, method, path, params):
+        """녹화된 응답 반환 (에러 응답이면 FacebookRequestError 발생)"""
+        key = request_key(method, path, params)
+        with self._lock:
+            queue = self._entries.get(key)
+            if queue:
+                entry = queue.popleft()
+                self._last[key] = entry
+            elif key in self._last:
+                # 녹화보다 많이 호출되면 마지막 응답을 반복
+                entry = self._last[key]
+            else:
+                raise CassetteMiss(f"녹화되지 않은 요청: {key}")
+
+        if self.replay_latency and entry['latency']:
+            time.sleep(entry['latency'])
+
+        response = FacebookResponse(
+            body=entry['body'],
+            http_status=entry['status'],
+            headers=entry['headers'],
+            call={'method': method, 'path': _normalize_path(path), 'params': params},
+        )
+        if response.is_failure():
+            raise response.error()
+        return response
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+
+def cassette_from_argv(argv):
+    """
+    --record / --replay / --replay-latency 인자 처리
+
+    returns: (Cassette or None, 해당 인자를 제거한 argv)
+    """
+    remaining = []
+    record_path = replay_path = None
+    replay_latency = False
+    args = iter(argv)
+    for arg in args:
+        if arg == '--record':
+            record_path = next(args, None)
+        elif arg == '--replay':
+            replay_path = next(args, None)
+        elif arg == '--replay-latency':
+            replay_latency = True
+        else:
+            remaining.append(arg)
+
+    if record_path and replay_path:
+        raise ValueError("--record와 --replay는 함께 사용할 수 없습니다.")
+    if record_path:
+        return Cassette(record_path, 'record'), remaining
+    if replay_path:
+        return Cassette(replay_path, 'replay', replay_latency=replay_latency), remaining
+    return None, remaining
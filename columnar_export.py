@@ -0,0 +1,152 @@
+# -*- coding: utf-8 -*-
+"""
+분석 결과 컬럼형 내보내기 (Arrow IPC + Parquet)
+
+analyze_meta_ads 결과의 원본 인사이트 행(df_raw)과 소재별 집계(df_grouped)를
+광고주 / 날짜 단위 파티션으로 저장한다.
+
+  <export_dir>/client=<광고주>/date=<YYYY-MM-DD>/raw.arrow       해당 일자(date_start)의 일별 행
+                                                /raw.parquet
+                                                /grouped.arrow   해당 일자로 끝나는 D7 집계
+                                                /grouped.parquet
+
+D7 구간은 실행마다 6일씩 겹치므로 원본 행은 행 자체의 일자로 나눠 저장한다.
+다음 실행이 같은 일자를 다시 쓰면 덮어쓰므로 load_history(table='raw')에 중복이 생기지 않는다.
+
+소재명·광고세트명 등 반복되는 문자열 컬럼은 dictionary 인코딩한다.
+.arrow 파일은 압축 없는 IPC(Feather v2)라 memory_map으로 복사 없이 읽을 수 있고,
+.parquet 파일은 다른 도구와 주고받거나 장기 보관할 때 쓴다.
+
+pyarrow가 설치된 경우에만 사용할 수 있다 (pip install pyarrow).
+"""
+
+import os
+
+try:
+    import pyarrow as pa
+    import pyarrow.feather as feather
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+
+from utils import atomic_write
+
+TABLES = ('raw', 'grouped')
+DICTIONARY_COLUMNS = ('ad_name', 'adset_name', 'material_type', 'campaign_name')
+
+
+def _require_pyarrow():
+    if pa is None:
+        raise RuntimeError("컬럼형 내보내기에는 pyarrow가 필요합니다 (pip install pyarrow).")
+
+
+def _partition_value(value):
+    return str(value).replace('/', '_').replace(os.sep, '_')
+
+
+def partition_dir(export_dir, client_name, end_date):
+    """광고주 / 종료일 파티션 경로 (end_date: date/datetime 또는 'YYYY-MM-DD')"""
+    if hasattr(end_date, 'strftime'):
+        end_date = end_date.strftime('%Y-%m-%d')
+    return os.path.join(
+        export_dir,
+        f"client={_partition_value(client_name)}",
+        f"date={_partition_value(end_date)}",
+    )
+
+
+def to_table(df):
+    """DataFrame → Arrow 테이블 (반복 문자열 컬럼은 dictionary 인코딩)"""
+    _require_pyarrow()
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    for name in DICTIONARY_COLUMNS:
+        idx = table.schema.get_field_index(name)
+        if idx < 0 or pa.types.is_dictionary(table.schema.field(idx).type):
+            continue
+        table = table.set_column(idx, name, table.column(idx).dictionary_encode())
+    return table
+
+
+def _write_table(target, name, df):
+    """파티션 디렉터리에 name.arrow / name.parquet 저장 → 경로 리스트"""
+    table = to_table(df)
+    arrow_path = os.path.join(target, f"{name}.arrow")
+    atomic_write(arrow_path, lambda f: feather.write_feather(table, f, compression='uncompressed'), 'wb')
+    parquet_path = os.path.join(target, f"{name}.parquet")
+    atomic_write(parquet_path, lambda f: pq.write_table(table, f), 'wb')
+    return [arrow_path, parquet_path]
+
+
+def export_result(result, export_dir, end_date):
+    """
+    분석 결과를 파티션에 저장 (같은 파티션이 있으면 덮어씀)
+
+    df_raw는 date_start 일자별 파티션, df_grouped는 분석기간 종료일 파티션에 저장한다.
+
+    returns: 저장한 파일 경로 리스트
+    """
+    _require_pyarrow()
+    client_name = result.get('client_name', '광고주')
+    if hasattr(end_date, 'strftime'):
+        end_date = end_date.strftime('%Y-%m-%d')
+
+    paths = []
+    df_raw = result.get('df_raw')
+    if df_raw is not None and not df_raw.empty:
+        if 'date_start' in df_raw:
+            days = df_raw['date_start'].where(df_raw['date_start'].astype(bool), end_date)
+        else:
+            days = [end_date] * len(df_raw)
+        for day, rows in df_raw.groupby(days, sort=True):
+            paths.extend(_write_table(partition_dir(export_dir, client_name, day), 'raw', rows))
+
+    df_grouped = result.get('df_grouped')
+    if df_grouped is not None:
+        paths.extend(_write_table(partition_dir(export_dir, client_name, end_date), 'grouped', df_grouped))
+    return paths
+
+
+def _partitions(export_dir, client_name=None):
+    """(광고주, 종료일, 경로) 목록 (광고주 → 날짜 순)"""
+    if not os.path.isdir(export_dir):
+        return []
+    found = []
+    for client_part in sorted(os.listdir(export_dir)):
+        if not client_part.startswith('client='):
+            continue
+        client = client_part[len('client='):]
+        if client_name is not None and client != _partition_value(client_name):
+            continue
+        client_dir = os.path.join(export_dir, client_part)
+        for date_part in sorted(os.listdir(client_dir)):
+            if date_part.startswith('date='):
+                found.append((client, date_part[len('date='):], os.path.join(client_dir, date_part)))
+    return found
+
+
+def load_history(export_dir, client_name=None, table='grouped', memory_map=True):
+    """
+    저장된 파티션을 하나의 Arrow 테이블로 읽기 (client / date 컬럼 추가)
+
+    table='raw'면 일자별 원본 행(일자마다 마지막 실행 기준), 'grouped'면 종료일별 D7 집계다.
+
+    memory_map=True면 .arrow 파일을 메모리 매핑으로 읽어 복사 없이 사용한다.
+    pandas가 필요하면 반환값에 .to_pandas()를 호출한다.
+    """
+    _require_pyarrow()
+    if table not in TABLES:
+        raise ValueError(f"알 수 없는 테이블: {table} ({', '.join(TABLES)})")
+
+    tables = []
+    for client, date, path in _partitions(export_dir, client_name):
+        arrow_path = os.path.join(path, f"{table}.arrow")
+        if not os.path.exists(arrow_path):
+            continue
+        part = feather.read_table(arrow_path, memory_map=memory_map)
+        part = part.append_column('client', pa.array([client] * part.num_rows).dictionary_encode())
+        part = part.append_column('date', pa.array([date] * part.num_rows).dictionary_encode())
+        tables.append(part)
+
+    if not tables:
+        return None
+    return pa.concat_tables(tables, promote_options='default')
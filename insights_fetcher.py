@@ -0,0 +1,119 @@
+# -*- coding: utf-8 -*-
+"""
+광고 인사이트 조회 (단일 호출 / 일자·캠페인 단위 샤딩 병렬 조회)
+
+샤딩 모드는 기간을 하루 단위로, 캠페인 필터를 캠페인 단위로 나눠 동시에 조회한 뒤
+샤드 순서대로 이어 붙여 단일 호출과 같은 행 리스트를 반환한다.
+각 샤드는 독립적으로 재시도하므로 일부 실패 시 해당 샤드만 다시 호출한다.
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+from facebook_business.exceptions import FacebookRequestError
+
+from inventory_crawler import DEFAULT_CONCURRENCY
+from meta_api import api_call_with_retry, backoff_sleep
+from metrics import map_in_context
+
+SHARD_MODES = ('day', 'campaign')
+MAX_SHARD_ATTEMPTS = 3
+SHARD_RETRY_WAIT = 5  # 초 (시도마다 2배)
+
+
+def parse_shard_mode(value):
+    """'day', 'campaign', 'day,campaign' 등 설정값 → 샤딩 기준 집합"""
+    if not value:
+        return set()
+    modes = {part.strip() for part in str(value).split(',') if part.strip()}
+    unknown = modes - set(SHARD_MODES)
+    if unknown:
+        raise ValueError(f"알 수 없는 insights_shard 값: {', '.join(sorted(unknown))}")
+    return modes
+
+
+def build_shards(date_range, campaign_ids, modes):
+    """(time_range, campaign_ids) 샤드 목록 (일자 → 캠페인 순)"""
+    if 'day' in modes:
+        day = datetime.strptime(date_range['since'], '%Y-%m-%d')
+        last = datetime.strptime(date_range['until'], '%Y-%m-%d')
+        ranges = []
+        while day <= last:
+            day_str = day.strftime('%Y-%m-%d')
+            ranges.append({'since': day_str, 'until': day_str})
+            day += timedelta(days=1)
+    else:
+        ranges = [date_range]
+
+    if 'campaign' in modes:
+        id_groups = [[cid] for cid in campaign_ids]
+    else:
+        id_groups = [list(campaign_ids)]
+
+    return [(time_range, ids) for time_range in ranges for ids in id_groups]
+
+
+def _is_transient(error):
+    if error.api_transient_error():
+        return True
+    return error.api_error_code() in (1, 2) or (error.http_status() or 0) >= 500
+
+
+def fetch_insights(account, fields, date_range, campaign_ids, shard_mode=None,
+                   max_workers=DEFAULT_CONCURRENCY, progress_callback=None, extra_params=None):
+    """
+    광고 레벨 인사이트 조회
+
+    shard_mode가 비어 있으면 기존과 같이 단일 호출, 'day' / 'campaign' / 'day,campaign'이면
+    해당 기준으로 나눠 병렬 조회한다. 호출 속도는 공유 RateBudget이 제어한다.
+    """
+    modes = parse_shard_mode(shard_mode)
+
+    def fetch(time_range, ids):
+        params = {
+            'level': 'ad',
+            'time_range': time_range,
+            'filtering': [
+                {
+                    'field': 'campaign.id',
+                    'operator': 'IN',
+                    'value': ids
+                }
+            ],
+            'limit': 500
+        }
+        if extra_params:
+            params.update(extra_params)
+        return api_call_with_retry(
+            lambda: list(account.get_insights(fields=fields, params=params)),
+            progress_callback=progress_callback
+        )
+
+    if not modes:
+        return fetch(date_range, list(campaign_ids))
+
+    shards = build_shards(date_range, campaign_ids, modes)
+
+    def fetch_shard(shard):
+        time_range, ids = shard
+        for attempt in range(MAX_SHARD_ATTEMPTS):
+            try:
+                return fetch(time_range, ids)
+            except FacebookRequestError as e:
+                if attempt == MAX_SHARD_ATTEMPTS - 1 or not _is_transient(e):
+                    raise
+                wait = SHARD_RETRY_WAIT * (2 ** attempt)
+                if progress_callback:
+                    progress_callback(
+                        f"인사이트 샤드 {time_range['since']}~{time_range['until']} 조회 실패, "
+                        f"{wait}초 후 재시도... ({attempt+1}/{MAX_SHARD_ATTEMPTS})"
+                    )
+                backoff_sleep(wait)
+
+    if progress_callback:
+        progress_callback(f"인사이트 {len(shards)}개 샤드 병렬 조회 ({'+'.join(sorted(modes))})")
+
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+        pages = map_in_context(executor, fetch_shard, shards)
+
+    return [row for page in pages for row in page]
@@ -0,0 +1,274 @@
+# -*- coding: utf-8 -*-
+"""
+당일 소재 소진 실시간 모니터링 → Discord 경고
+
+사용법:
+  python intraday_monitor.py [--interval 30] [--once] [--metrics-port 9464] [--metrics-file PATH]
+
+  --interval N       폴링 주기(분, 기본 30)
+  --once             한 번만 조회하고 종료 (cron 등 외부 스케줄러용)
+  --metrics-port N   127.0.0.1:N/metrics 로 운영 지표 제공 (데몬 모드)
+  --metrics-file     폴링마다 운영 지표를 PATH에 기록 (textfile collector용)
+
+광고주 설정 (clients.json):
+  intraday_spend_alert   오늘 지출이 이 금액(원) 이상이면서 ROAS가 기준 미만이면 경고 (기본 100000)
+  intraday_min_roas      경고 기준 ROAS(%) (기본 low_roas_threshold, 없으면 85)
+
+폴링 1회 = 광고주당 인사이트 API 1회 호출 (시간대별 breakdown, 최소 필드).
+캠페인 ID를 따로 조회하지 않고 캠페인명(target_campaigns) + 활성 상태 필터를 인사이트 호출에
+직접 넘기므로, 새로 켜진 타겟 캠페인도 다음 폴링부터 바로 반영된다.
+직전 폴링과 시간대별 행을 비교해 값이 바뀐 소재만 다시 평가하고, 소재당 하루 한 번만 경고한다.
+"""
+
+import json
+import os
+import sys
+import time
+from datetime import datetime
+
+from facebook_business.adobjects.adaccount import AdAccount
+from facebook_business.exceptions import FacebookRequestError
+
+from analysis_engine import get_purchase_revenue
+from campaign_resolver import fetch_target_campaigns
+from meta_api import api_call_with_retry, init_client_api
+from metrics import ROWS_FETCHED, current_client, serve_metrics, write_textfile
+from report_renderer import format_money
+from send_to_discord import send_report
+from utils import atomic_write, option_from_argv
+
+HOURLY_BREAKDOWN = 'hourly_stats_aggregated_by_advertiser_time_zone'
+POLL_FIELDS = ['ad_id', 'ad_name', 'campaign_name', 'spend', 'action_values']
+
+DEFAULT_INTERVAL_MINUTES = 30
+DEFAULT_SPEND_ALERT = 100000
+
+# --once 실행 간에도 직전 폴링 / 경고 이력을 이어가기 위한 상태 파일
+STATE_PATH = os.environ.get('META_INTRADAY_STATE_PATH', os.path.join('.cache', 'intraday_state.json'))
+
+
+def _query_hourly(account, filtering, progress_callback):
+    today_str = datetime.now().strftime('%Y-%m-%d')
+    return api_call_with_retry(
+        lambda: list(account.get_insights(
+            fields=POLL_FIELDS,
+            params={
+                'level': 'ad',
+                'time_range': {'since': today_str, 'until': today_str},
+                'breakdowns': [HOURLY_BREAKDOWN],
+                'filtering': filtering,
+                'limit': 5000
+            }
+        )),
+        progress_callback=progress_callback
+    )
+
+
+def fetch_hourly_rows(account, target_names, progress_callback=None):
+    """
+    오늘 활성 타겟 캠페인의 광고별 시간대 인사이트 조회 (단일 호출)
+
+    캠페인명 필터를 지원하지 않는 계정(에러 100)이면 캠페인 ID를 조회해 필터링한다 (2회 호출).
+    """
+    target_names = list(target_names)
+    try:
+        rows = _query_hourly(account, [
+            {'field': 'campaign.name', 'operator': 'IN', 'value': target_names},
+            {'field': 'campaign.effective_status', 'operator': 'IN', 'value': ['ACTIVE']},
+        ], progress_callback)
+    except FacebookRequestError as e:
+        if e.api_error_code() != 100:
+            raise
+        campaign_ids = [cid for cid, _ in fetch_target_campaigns(account, target_names, progress_callback)]
+        if not campaign_ids:
+            return []
+        rows = _query_hourly(account, [
+            {'field': 'campaign.id', 'operator': 'IN', 'value': campaign_ids},
+        ], progress_callback)
+
+    # 서버 필터는 부분 일치 가능성이 있어 정확한 이름으로 한 번 더 확인
+    names = set(target_names)
+    return [row for row in rows if row.get('campaign_name', '') in names]
+
+
+def diff_hourly_rows(rows, previous_hours):
+    """
+    직전 폴링 대비 변경된 (ad_id, 시간대) 행 반영
+
+    returns: (hours {(ad_id, hour): (spend, revenue)}, names {ad_id: ad_name}, changed_ad_ids)
+    """
+    hours = {}
+    names = {}
+    changed = set()
+    for row in rows:
+        ad_id = row.get('ad_id', '')
+        key = (ad_id, row.get(HOURLY_BREAKDOWN, ''))
+        value = (float(row.get('spend', 0)), get_purchase_revenue(row.get('action_values', [])))
+        hours[key] = value
+        names[ad_id] = row.get('ad_name', '')
+        if previous_hours.get(key) != value:
+            changed.add(ad_id)
+    return hours, names, changed
+
+
+class IntradayMonitor:
+    """광고주 1곳의 당일 폴링 상태"""
+
+    def __init__(self, client_name, config):
+        self.client_name = client_name
+        self.config = config
+        self.spend_alert = config.get('intraday_spend_alert', DEFAULT_SPEND_ALERT)
+        self.min_roas = config.get('intraday_min_roas', config.get('low_roas_threshold', 85))
+        self.date = None
+        self.hours = {}
+        self.alerted = set()
+
+    def _reset_if_new_day(self):
+        today = datetime.now().strftime('%Y-%m-%d')
+        if self.date != today:
+            self.date = today
+            self.hours = {}
+            self.alerted = set()
+
+    def poll(self, progress_callback=None):
+        """1회 폴링 → 경고 대상 소재 리스트 [(ad_name, spend, revenue, roas, spend_delta)]"""
+        self._reset_if_new_day()
+        init_client_api(self.config)
+        account = AdAccount(self.config['ad_account_id'])
+
+        rows = fetch_hourly_rows(account, self.config['target_campaigns'], progress_callback)
+        ROWS_FETCHED.inc(len(rows), kind='hourly')
+        hours, names, changed = diff_hourly_rows(rows, self.hours)
+
+        totals = {}
+        for (ad_id, _), (spend, revenue) in hours.items():
+            if ad_id in changed:
+                prev_spend, prev_revenue = totals.get(ad_id, (0, 0))
+                totals[ad_id] = (prev_spend + spend, prev_revenue + revenue)
+
+        previous_spend = {}
+        for (ad_id, _), (spend, _) in self.hours.items():
+            if ad_id in changed:
+                previous_spend[ad_id] = previous_spend.get(ad_id, 0) + spend
+
+        self.hours = hours
+
+        alerts = []
+        for ad_id, (spend, revenue) in totals.items():
+            if ad_id in self.alerted or spend < self.spend_alert:
+                continue
+            roas = revenue / spend * 100 if spend > 0 else 0
+            if roas >= self.min_roas:
+                continue
+            self.alerted.add(ad_id)
+            alerts.append((names[ad_id], spend, revenue, roas, spend - previous_spend.get(ad_id, 0)))
+
+        alerts.sort(key=lambda a: a[1], reverse=True)
+        return alerts
+
+    def export_state(self):
+        return {
+            'date': self.date,
+            'hours': {f"{ad_id}|{hour}": list(value) for (ad_id, hour), value in self.hours.items()},
+            'alerted': sorted(self.alerted),
+        }
+
+    def restore_state(self, state):
+        self.date = state.get('date')
+        self.hours = {}
+        for key, value in state.get('hours', {}).items():
+            ad_id, _, hour = key.partition('|')
+            self.hours[(ad_id, hour)] = tuple(value)
+        self.alerted = set(state.get('alerted', []))
+
+
+def load_states():
+    try:
+        with open(STATE_PATH, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def save_states(monitors):
+    states = {m.client_name: m.export_state() for m in monitors}
+    atomic_write(STATE_PATH, lambda f: json.dump(states, f, ensure_ascii=False))
+
+
+def build_alert_text(client_name, alerts, min_roas):
+    """경고 메시지 (Discord 마크다운)"""
+    lines = [f"⚠️ **{client_name} 실시간 소진 경고** ({datetime.now().strftime('%m.%d %H:%M')} 기준)", ""]
+    for idx, (ad_name, spend, revenue, roas, delta) in enumerate(alerts, 1):
+        lines.append(f"{idx}) {ad_name}")
+        lines.append(
+            f"- 오늘 {format_money(spend)} 지출 / 매출 {format_money(revenue)} / ROAS: {int(roas)}% "
+            f"(기준 {int(min_roas)}%) / 직전 폴링 대비 +{format_money(delta)}"
+        )
+    return "\n".join(lines) + "\n"
+
+
+def run_once(monitors):
+    for monitor in monitors:
+        current_client.set(monitor.client_name)
+        try:
+            alerts = monitor.poll(progress_callback=print)
+        except Exception as e:
+            print(f"[ERROR] {monitor.client_name} 폴링 실패: {e}")
+            continue
+
+        if not alerts:
+            print(f"[OK] {monitor.client_name}: 경고 대상 없음")
+            continue
+
+        text = build_alert_text(monitor.client_name, alerts, monitor.min_roas)
+        webhook_url = monitor.config.get('discord_webhook', '')
+        if not webhook_url:
+            print(text)
+            continue
+        success, msg = send_report(webhook_url, text)
+        print(f"[{'ALERT' if success else 'FAIL'}] {monitor.client_name}: 경고 {len(alerts)}건 - {msg}")
+
+    try:
+        save_states(monitors)
+    except OSError as e:
+        print(f"[WARN] 모니터링 상태 저장 실패: {e}")
+
+
+def main():
+    argv = sys.argv[1:]
+    interval, argv = option_from_argv(argv, '--interval')
+    interval = float(interval) if interval else DEFAULT_INTERVAL_MINUTES
+    metrics_port, argv = option_from_argv(argv, '--metrics-port')
+    metrics_file, argv = option_from_argv(argv, '--metrics-file')
+    once = '--once' in argv
+
+    if metrics_port:
+        serve_metrics(int(metrics_port))
+        print(f"운영 지표: http://127.0.0.1:{metrics_port}/metrics")
+
+    with open('clients.json', 'r', encoding='utf-8') as f:
+        clients = json.load(f)
+
+    states = load_states()
+    monitors = []
+    for client_name, config in clients.items():
+        config['client_name'] = client_name
+        monitor = IntradayMonitor(client_name, config)
+        if client_name in states:
+            monitor.restore_state(states[client_name])
+        monitors.append(monitor)
+
+    print(f"=== 실시간 소진 모니터링 시작 ({len(monitors)}개 광고주, {interval:g}분 주기) ===\n")
+
+    while True:
+        print(f"--- {datetime.now().strftime('%H:%M:%S')} 폴링 ---")
+        run_once(monitors)
+        if metrics_file:
+            write_textfile(metrics_file)
+        if once:
+            break
+        time.sleep(interval * 60)
+
+
+if __name__ == '__main__':
+    main()
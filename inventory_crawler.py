@@ -0,0 +1,66 @@
+# -*- coding: utf-8 -*-
+"""
+캠페인별 광고세트 / 소재 병렬 조회 (동시 실행 수 제한)
+
+호출 속도는 meta_api.BudgetedAdsApi의 공유 토큰 버킷이 제어하고,
+결과는 입력 캠페인 순서 → 광고세트 응답 순서 그대로 반환한다.
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+
+from facebook_business.adobjects.adset import AdSet
+from facebook_business.adobjects.campaign import Campaign
+
+from meta_api import api_call_with_retry
+from metrics import map_in_context
+
+DEFAULT_CONCURRENCY = 4
+
+ADSET_FIELDS = ['id', 'name', 'effective_status', 'daily_budget']
+AD_FIELDS = ['id', 'name', 'effective_status']
+
+
+def crawl_inventory(campaign_ids, max_workers=DEFAULT_CONCURRENCY, progress_callback=None):
+    """
+    캠페인 → 활성 광고세트 → 소재 조회
+
+    returns:
+        [{'campaign_id': cid, 'adsets': [{'adset': adset, 'ads': [ad, ...]}, ...]}, ...]
+        (campaign_ids 순서 유지, ACTIVE 광고세트만 포함)
+    """
+
+    def fetch_adsets(cid):
+        return api_call_with_retry(
+            lambda: list(Campaign(cid).get_ad_sets(fields=ADSET_FIELDS)),
+            progress_callback=progress_callback
+        )
+
+    def fetch_ads(adset_id):
+        return api_call_with_retry(
+            lambda: list(AdSet(adset_id).get_ads(fields=AD_FIELDS)),
+            progress_callback=progress_callback
+        )
+
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+        # 1) 캠페인별 광고세트 (입력 순서대로 결과 반환)
+        adsets_by_campaign = map_in_context(executor, fetch_adsets, campaign_ids)
+
+        active_adsets = [
+            [adset for adset in adsets if adset.get('effective_status') == 'ACTIVE']
+            for adsets in adsets_by_campaign
+        ]
+
+        # 2) 활성 광고세트별 소재 (전 캠페인 광고세트를 한 번에 병렬 조회)
+        flat_adsets = [adset for adsets in active_adsets for adset in adsets]
+        flat_ads = map_in_context(executor, lambda adset: fetch_ads(adset['id']), flat_adsets)
+
+    inventory = []
+    offset = 0
+    for cid, adsets in zip(campaign_ids, active_adsets):
+        ads_slice = flat_ads[offset:offset + len(adsets)]
+        offset += len(adsets)
+        inventory.append({
+            'campaign_id': cid,
+            'adsets': [{'adset': adset, 'ads': ads} for adset, ads in zip(adsets, ads_slice)],
+        })
+    return inventory
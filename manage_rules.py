@@ -6,6 +6,9 @@ Meta 광고 규칙 자동 관리
   python manage_rules.py sync [--dry-run]    현재 활성 소재 감지 → 규칙 자동 업데이트 (추가/제거)
   python manage_rules.py reset [--dry-run]   규칙 전체 삭제 → 재생성
   python manage_rules.py status              현재 규칙 상태 확인
+
+  --record PATH / --replay PATH [--replay-latency]   API 호출 녹화 / 오프라인 재생 (cassette.py 참고)
+  --metrics-file PATH                                운영 지표를 PATH에 기록 (textfile collector용)
 """
 
 import json
@@ -13,13 +16,16 @@ import sys
 import time
 from datetime import datetime
 
-from facebook_business.api import FacebookAdsApi
 from facebook_business.adobjects.adaccount import AdAccount
-from facebook_business.adobjects.campaign import Campaign
-from facebook_business.adobjects.adset import AdSet
 from facebook_business.adobjects.adrule import AdRule
 from facebook_business.adobjects.ad import Ad
 
+from campaign_resolver import resolve_active_inventory
+from cassette import cassette_from_argv
+from meta_api import init_client_api, use_cassette
+from metrics import current_client, write_textfile
+from utils import option_from_argv
+
 
 NOTIFY_USER_ID = '1891764834770068'
 
@@ -65,35 +71,25 @@ def load_config():
 
 def get_active_adsets(account, config):
     """활성 캠페인 → 활성 광고세트 + 활성 소재 조회"""
-    campaigns = list(account.get_campaigns(fields=['name', 'id', 'effective_status']))
-    target = [(c['id'], c['name']) for c in campaigns
-              if c['name'] in config['target_campaigns'] and c['effective_status'] == 'ACTIVE']
+    target, inventory = resolve_active_inventory(account, config)
 
     budget_rule_pct = config.get('budget_rule_pct', 50)
     adset_data = []
     all_da_ads = []
     all_va_ads = []
 
-    for cid, cname in target:
+    for (cid, cname), campaign_entry in zip(target, inventory):
         campaign_short = get_campaign_short(cname)
-        camp = Campaign(cid)
-        adsets = list(camp.get_ad_sets(fields=['id', 'name', 'effective_status', 'daily_budget']))
-        time.sleep(1)
-
-        for adset in adsets:
-            if adset.get('effective_status') != 'ACTIVE':
-                continue
 
+        for entry in campaign_entry['adsets']:
+            adset = entry['adset']
             adset_name = adset['name']
             budget = int(adset.get('daily_budget', 0))
             threshold = budget * budget_rule_pct // 100
             targeting = get_targeting_short(adset_name)
             ad_type = get_adset_type(adset_name)
 
-            adset_obj = AdSet(adset['id'])
-            ads = list(adset_obj.get_ads(fields=['id', 'name', 'effective_status']))
-            active_ads = [(a['id'], a['name']) for a in ads if a.get('effective_status') == 'ACTIVE']
-            time.sleep(1)
+            active_ads = [(a['id'], a['name']) for a in entry['ads'] if a.get('effective_status') == 'ACTIVE']
 
             if not active_ads:
                 continue
@@ -248,7 +244,9 @@ def cmd_reset(account, config, dry_run=False):
             deleted += 1
     print(f"  → {deleted}개 {'삭제 예정' if dry_run else '삭제 완료'}")
 
-    date_str = datetime.now().strftime('%y%m%d')
+    # 규칙명 날짜는 요청 파라미터에 들어가므로 재생 시에는 녹화 시각(as_of)을 쓴다
+    as_of = config.get('as_of')
+    date_str = (datetime.fromisoformat(as_of) if as_of else datetime.now()).strftime('%y%m%d')
 
     print(f"\n[3] OFF 규칙 생성 중...")
     for d in adset_data:
@@ -329,8 +327,10 @@ def cmd_status(account):
 # ── main ──
 
 def main():
-    args = [a for a in sys.argv[1:] if not a.startswith('--')]
-    dry_run = '--dry-run' in sys.argv
+    cassette, argv = cassette_from_argv(sys.argv[1:])
+    metrics_file, argv = option_from_argv(argv, '--metrics-file')
+    args = [a for a in argv if not a.startswith('--')]
+    dry_run = '--dry-run' in argv
     command = args[0] if args else 'sync'
 
     if command not in ('sync', 'reset', 'status'):
@@ -343,22 +343,37 @@ def main():
     if dry_run:
         print("[DRY-RUN] 실제 변경 없이 미리보기만 합니다.\n")
 
-    clients = load_config()
-
-    for client_name, config in clients.items():
-        print(f"=== {client_name} ===\n")
+    if cassette is not None:
+        use_cassette(cassette)
+        print(f"[{'RECORD' if cassette.recording else 'REPLAY'}] {cassette.path}\n")
 
-        FacebookAdsApi.init(access_token=config['access_token'])
-        account = AdAccount(config['ad_account_id'])
-
-        if command == 'sync':
-            cmd_sync(account, config, dry_run)
-        elif command == 'reset':
-            cmd_reset(account, config, dry_run)
-        elif command == 'status':
-            cmd_status(account)
+    clients = load_config()
 
-        print()
+    try:
+        for client_name, config in clients.items():
+            print(f"=== {client_name} ===\n")
+            current_client.set(client_name)
+
+            if cassette is not None:
+                config['campaign_cache'] = False
+                if not cassette.recording:
+                    config['as_of'] = cassette.recorded_at
+            init_client_api(config)
+            account = AdAccount(config['ad_account_id'])
+
+            if command == 'sync':
+                cmd_sync(account, config, dry_run)
+            elif command == 'reset':
+                cmd_reset(account, config, dry_run)
+            elif command == 'status':
+                cmd_status(account)
+
+            print()
+    finally:
+        if cassette is not None:
+            cassette.close()
+        if metrics_file:
+            write_textfile(metrics_file)
 
 
 if __name__ == '__main__':
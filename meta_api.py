@@ -0,0 +1,415 @@
+# -*- coding: utf-8 -*-
+"""
+Graph API 호출 공통 모듈 (재시도 + 사용량 헤더 기반 토큰 버킷 + 토큰 풀)
+
+모든 SDK 호출은 기본 API 객체의 call()을 거치므로, BudgetedAdsApi를 기본 API로
+등록하면 페이지네이션 요청까지 포함한 전체 호출이 공유 예산을 따른다.
+토큰이 여러 개면 PooledAdsApi가 호출 단위로 가장 여유 있는 토큰에 분산한다.
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+
+from facebook_business.api import FacebookAdsApi
+from facebook_business.exceptions import FacebookRequestError
+from facebook_business.session import FacebookSession
+
+from metrics import API_CALLS, API_LATENCY, API_RETRIES, API_RETRY_SLEEP, API_THROTTLE_SLEEP, API_USAGE
+
+# 사용량 헤더 (값은 JSON 문자열)
+USAGE_HEADERS = ('x-app-usage', 'x-ad-account-usage', 'x-business-use-case-usage')
+
+DEFAULT_RATE = 4.0     # 초당 호출 수 (사용량 여유 시)
+DEFAULT_BURST = 4      # 버킷 최대 토큰 수
+SLOWDOWN_PCT = 50      # 이 사용률부터 호출 속도 감속
+BLOCK_PCT = 95         # 이 사용률 이상이면 회복 시간까지 대기
+DEFAULT_BLOCK_SECONDS = 60
+
+# 호출 한도 관련 에러 코드 (앱 / 사용자 / 페이지 / 계정 단위 / 비즈니스 유스케이스)
+THROTTLE_ERROR_CODES = {4, 17, 32, 613, 80000, 80003, 80004, 80014}
+# 광고 계정(비즈니스 유스케이스) 단위 한도 → 다른 토큰으로 바꿔도 풀리지 않음
+ACCOUNT_THROTTLE_CODES = set(range(80000, 80015))
+MAX_ACCOUNT_THROTTLE_RETRIES = 3
+# 토큰에 해당 광고 계정 권한이 없을 때의 에러 (코드, 서브코드 None이면 서브코드 무관)
+ACCESS_ERRORS = {(10, None), (190, None), (200, None), (100, 33)}
+
+
+def api_call_with_retry(func, max_retries=5, initial_wait=60, progress_callback=None):
+    """API 호출 시 rate limit 에러 발생하면 자동 재시도"""
+    for attempt in range(max_retries):
+        try:
+            return func()
+        except FacebookRequestError as e:
+            if e.api_error_code() == 17:
+                wait = initial_wait * (2 ** attempt)
+                if progress_callback:
+                    progress_callback(f"API 한도 초과. {wait}초 대기 후 재시도... ({attempt+1}/{max_retries})")
+                API_RETRIES.inc()
+                API_RETRY_SLEEP.inc(backoff_sleep(wait))
+            else:
+                raise
+    raise Exception(f"API 호출 {max_retries}회 재시도 후에도 실패")
+
+
+def _header(headers, name):
+    if not headers:
+        return None
+    value = headers.get(name)
+    if value is None:
+        # requests의 CaseInsensitiveDict가 아닌 일반 dict 대비
+        lowered = name.lower()
+        for key, v in headers.items():
+            if key.lower() == lowered:
+                return v
+    return value
+
+
+def parse_usage_headers(headers):
+    """
+    응답 헤더에서 최대 사용률(%)과 회복 대기 시간(초) 추출
+
+    returns: (usage_pct or None, regain_seconds)
+    """
+    usage = None
+    regain_seconds = 0
+
+    def bump(pct):
+        nonlocal usage
+        if pct is not None:
+            usage = pct if usage is None else max(usage, pct)
+
+    for name in USAGE_HEADERS:
+        raw = _header(headers, name)
+        if not raw:
+            continue
+        try:
+            data = json.loads(raw)
+        except (TypeError, ValueError):
+            continue
+
+        if name == 'x-app-usage':
+            bump(max(float(data.get(k, 0)) for k in ('call_count', 'total_time', 'total_cputime')))
+        elif name == 'x-ad-account-usage':
+            bump(float(data.get('acc_id_util_pct', 0)))
+            regain_seconds = max(regain_seconds, float(data.get('reset_time_duration', 0)))
+        else:
+            for entries in data.values():
+                for entry in entries:
+                    bump(max(float(entry.get(k, 0)) for k in ('call_count', 'total_time', 'total_cputime')))
+                    regain_seconds = max(regain_seconds, float(entry.get('estimated_time_to_regain_access', 0)) * 60)
+
+    return usage, regain_seconds
+
+
+class RateBudget:
+    """
+    사용량 헤더 연동 토큰 버킷 (스레드 안전)
+
+    사용률이 SLOWDOWN_PCT를 넘으면 보충 속도를 선형으로 줄이고,
+    BLOCK_PCT 이상이면 헤더가 알려준 회복 시간까지 모든 호출을 멈춘다.
+    """
+
+    def __init__(self, rate=DEFAULT_RATE, burst=DEFAULT_BURST):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.usage_pct = 0.0
+        self.blocked_until = 0.0
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _effective_rate(self):
+        if self.usage_pct <= SLOWDOWN_PCT:
+            return self.rate
+        scale = (BLOCK_PCT - self.usage_pct) / (BLOCK_PCT - SLOWDOWN_PCT)
+        return self.rate * max(scale, 0.05)
+
+    def _refill(self, now):
+        elapsed = now - self._updated
+        self._updated = now
+        self.tokens = min(self.burst, self.tokens + elapsed * self._effective_rate())
+
+    def acquire(self):
+        """토큰 1개 확보까지 대기"""
+        slept = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                if now < self.blocked_until:
+                    wait = self.blocked_until - now
+                else:
+                    self._refill(now)
+                    if self.tokens >= 1:
+                        self.tokens -= 1
+                        break
+                    wait = (1 - self.tokens) / self._effective_rate()
+            time.sleep(wait)
+            slept += wait
+        if slept:
+            API_THROTTLE_SLEEP.inc(slept)
+
+    def observe(self, headers):
+        """응답 헤더의 사용률 반영"""
+        usage, regain_seconds = parse_usage_headers(headers)
+        if usage is None:
+            return
+        with self._lock:
+            self._refill(time.monotonic())
+            self.usage_pct = usage
+            if usage >= BLOCK_PCT:
+                self._block(regain_seconds or DEFAULT_BLOCK_SECONDS)
+
+    def _block(self, seconds):
+        self.blocked_until = max(self.blocked_until, time.monotonic() + seconds)
+
+    def block(self, seconds):
+        """지정 시간 동안 호출 중단 (한도 초과 에러 수신 시)"""
+        with self._lock:
+            self._block(seconds)
+
+
+# 녹화/재생 중인 cassette.Cassette (None이면 실제 호출)
+_cassette = None
+
+
+def use_cassette(cassette):
+    """이후 모든 API 호출을 cassette로 녹화(record) 또는 대체(replay)"""
+    global _cassette
+    _cassette = cassette
+
+
+def _replaying():
+    return _cassette is not None and not _cassette.recording
+
+
+def backoff_sleep(seconds):
+    """
+    재시도 대기 → 실제로 기다린 초
+
+    cassette 재생 중에는 녹화된 한도 초과 에러가 그대로 다시 발생하지만 기다릴 이유가 없으므로
+    대기하지 않는다 (--replay-latency면 응답마다 녹화된 지연시간만 cassette가 적용).
+    """
+    if _replaying():
+        return 0
+    time.sleep(seconds)
+    return seconds
+
+
+def _is_access_error(error):
+    code = error.api_error_code()
+    return (code, None) in ACCESS_ERRORS or (code, error.api_error_subcode()) in ACCESS_ERRORS
+
+
+def _request_parts(args, kwargs):
+    """FacebookAdsApi.call(method, path, params, ...) 인자에서 (method, path, params) 추출"""
+    names = ('method', 'path', 'params')
+    values = list(args[:3]) + [kwargs.get(name) for name in names[len(args[:3]):]]
+    return values[0], values[1], values[2]
+
+
+class BudgetedAdsApi(FacebookAdsApi):
+    """모든 요청 전 RateBudget 토큰을 확보하고, 응답 헤더로 사용률을 갱신하는 API"""
+
+    def __init__(self, session, budget=None, **kwargs):
+        super().__init__(session, **kwargs)
+        self.budget = budget or RateBudget()
+        token = getattr(session, 'access_token', None) or ''
+        self.token_label = hashlib.sha256(token.encode('utf-8')).hexdigest()[:8]
+
+    def call(self, *args, **kwargs):
+        cassette = _cassette
+        if cassette is not None and not cassette.recording:
+            return cassette.replay(*_request_parts(args, kwargs))
+
+        self.budget.acquire()
+        started = time.monotonic()
+        try:
+            response = super().call(*args, **kwargs)
+        except FacebookRequestError as e:
+            latency = time.monotonic() - started
+            self._observe(e.http_headers(), latency,
+                          'throttled' if e.api_error_code() in THROTTLE_ERROR_CODES else 'error')
+            if cassette is not None:
+                cassette.record(*_request_parts(args, kwargs), e.http_status(), e.http_headers(),
+                                e.body(), latency)
+            raise
+        latency = time.monotonic() - started
+        self._observe(response.headers(), latency, 'ok')
+        if cassette is not None:
+            cassette.record(*_request_parts(args, kwargs), response.status(), response.headers(),
+                            response.body(), latency)
+        return response
+
+    def _observe(self, headers, latency, result):
+        self.budget.observe(headers)
+        API_CALLS.inc(result=result)
+        API_LATENCY.observe(latency)
+        API_USAGE.set(self.budget.usage_pct, token=self.token_label)
+
+
+class PooledAdsApi(FacebookAdsApi):
+    """
+    여러 access token에 호출을 분산하는 API
+
+    각 토큰은 자체 RateBudget을 가진 BudgetedAdsApi이며, 호출마다 차단되지 않은 토큰 중
+    사용률(헤더 기준)과 진행 중 호출 수가 가장 낮은 토큰으로 보낸다.
+    - 토큰 단위 한도 초과: 해당 토큰을 회복 시간 동안 격리하고 다른 토큰으로 재시도
+    - 광고 계정 단위 한도 초과(80000~80014): 토큰은 그대로 두고 풀(=광고 계정) 전체를 대기
+    - 계정 권한 없는 토큰: 이 풀에서 제외하고 다른 토큰으로 재시도
+    """
+
+    def __init__(self, members):
+        if not members:
+            raise ValueError("토큰 풀이 비어 있습니다.")
+        super().__init__(members[0]._session)
+        self.members = members
+        self._inflight = [0] * len(members)
+        self._denied = set()
+        self.blocked_until = 0.0
+        self._lock = threading.Lock()
+
+    def _pick(self, exclude):
+        """격리되지 않은 토큰 중 가장 여유 있는 토큰 인덱스 (없으면 None, 대기 시간)"""
+        now = time.monotonic()
+        if self.blocked_until > now:
+            return None, self.blocked_until - now
+        best = None
+        earliest = None
+        for idx, member in enumerate(self.members):
+            if idx in exclude or idx in self._denied:
+                continue
+            budget = member.budget
+            if budget.blocked_until > now:
+                earliest = budget.blocked_until if earliest is None else min(earliest, budget.blocked_until)
+                continue
+            score = (budget.usage_pct, self._inflight[idx])
+            if best is None or score < best[0]:
+                best = (score, idx)
+        if best is not None:
+            return best[1], 0
+        return None, (earliest - now) if earliest is not None else 0
+
+    def quarantine(self, idx, error):
+        """한도 초과 토큰 격리 (헤더의 회복 시간, 없으면 기본값 / 재생 중에는 격리 안 함)"""
+        if _replaying():
+            return
+        _, regain_seconds = parse_usage_headers(error.http_headers())
+        self.members[idx].budget.block(regain_seconds or DEFAULT_BLOCK_SECONDS)
+
+    def block_account(self, error):
+        """광고 계정 단위 한도 초과 → 풀 전체 대기 (헤더의 회복 시간, 없으면 기본값 / 재생 중에는 대기 안 함)"""
+        if _replaying():
+            return
+        _, regain_seconds = parse_usage_headers(error.http_headers())
+        with self._lock:
+            self.blocked_until = max(self.blocked_until,
+                                     time.monotonic() + (regain_seconds or DEFAULT_BLOCK_SECONDS))
+
+    def call(self, *args, **kwargs):
+        tried = set()
+        denied = set()
+        account_retries = 0
+        while True:
+            with self._lock:
+                idx, wait = self._pick(tried)
+                if idx is not None:
+                    self._inflight[idx] += 1
+            if idx is None:
+                if not wait:
+                    raise RuntimeError("토큰 풀에 이 광고 계정을 조회할 수 있는 토큰이 없습니다.")
+                # 계정 대기 중이거나 남은 토큰이 모두 격리 중 → 가장 먼저 풀리는 시점까지 대기
+                time.sleep(max(wait, 0.1))
+                continue
+
+            try:
+                response = self.members[idx].call(*args, **kwargs)
+            except FacebookRequestError as e:
+                code = e.api_error_code()
+                if code in ACCOUNT_THROTTLE_CODES:
+                    account_retries += 1
+                    if account_retries > MAX_ACCOUNT_THROTTLE_RETRIES:
+                        raise
+                    self.block_account(e)
+                elif code in THROTTLE_ERROR_CODES:
+                    self.quarantine(idx, e)
+                    tried.add(idx)
+                    if len(tried | self._denied) == len(self.members):
+                        raise
+                elif _is_access_error(e):
+                    # 다른 토큰이 성공하면 이 광고 계정 권한이 없는 토큰으로 보고 풀에서 제외
+                    denied.add(idx)
+                    tried.add(idx)
+                    if len(tried | self._denied) == len(self.members):
+                        raise
+                else:
+                    raise
+            else:
+                if denied:
+                    with self._lock:
+                        self._denied |= denied
+                return response
+            finally:
+                with self._lock:
+                    self._inflight[idx] -= 1
+
+
+# 토큰별 API 객체 (같은 프로세스 안에서 광고주 간 사용률 추적 공유)
+_TOKEN_APIS = {}
+_TOKEN_APIS_LOCK = threading.Lock()
+
+
+# 광고 계정별 토큰 풀 (권한 없는 토큰 제외 / 계정 대기 상태를 재초기화 사이에도 유지)
+_POOLS = {}
+
+
+def _token_api(access_token):
+    with _TOKEN_APIS_LOCK:
+        api = _TOKEN_APIS.get(access_token)
+        if api is None:
+            api = BudgetedAdsApi(FacebookSession(access_token=access_token))
+            _TOKEN_APIS[access_token] = api
+        return api
+
+
+def client_tokens(config):
+    """
+    광고주가 사용할 토큰 목록
+
+    config의 access_tokens(리스트) 또는 access_token에, 환경변수 META_ACCESS_TOKEN_POOL
+    (쉼표 구분, 전 광고주 공용)을 더한다. 중복은 제거하고 순서는 유지한다.
+    """
+    tokens = list(config.get('access_tokens') or [])
+    if config.get('access_token'):
+        tokens.insert(0, config['access_token'])
+    tokens.extend(t.strip() for t in os.environ.get('META_ACCESS_TOKEN_POOL', '').split(',') if t.strip())
+    return list(dict.fromkeys(tokens))
+
+
+def init_api(access_token):
+    """access_token 1개로 BudgetedAdsApi를 기본 API로 등록"""
+    api = _token_api(access_token)
+    FacebookAdsApi.set_default_api(api)
+    return api
+
+
+def init_client_api(config):
+    """광고주 설정의 토큰(풀)으로 기본 API 등록 (토큰 2개 이상이면 PooledAdsApi)"""
+    tokens = client_tokens(config)
+    if not tokens and _cassette is not None and not _cassette.recording:
+        tokens = ['REPLAY']
+    if not tokens:
+        raise ValueError("access_token 또는 access_tokens 설정이 필요합니다.")
+    if len(tokens) == 1:
+        return init_api(tokens[0])
+    with _TOKEN_APIS_LOCK:
+        key = (config.get('ad_account_id'), tuple(tokens))
+        api = _POOLS.get(key)
+    if api is None:
+        api = PooledAdsApi([_token_api(t) for t in tokens])
+        with _TOKEN_APIS_LOCK:
+            api = _POOLS.setdefault(key, api)
+    FacebookAdsApi.set_default_api(api)
+    return api
@@ -0,0 +1,180 @@
+# -*- coding: utf-8 -*-
+"""
+운영 지표 (Prometheus 텍스트 포맷)
+
+광고주 라벨은 current_client 컨텍스트 변수로 전달한다. 스레드 풀 작업은
+submit_in_context / map_in_context로 제출해야 호출한 쪽의 광고주 라벨이 유지된다.
+
+내보내기:
+  write_textfile(path)   node_exporter textfile collector용 파일 (원자적 교체)
+  serve_metrics(port)    데몬 모드용 로컬 /metrics HTTP 엔드포인트
+"""
+
+import contextvars
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from utils import atomic_write
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+LATENCY_BUCKETS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+current_client = contextvars.ContextVar('current_client', default='')
+
+_REGISTRY = []
+_LOCK = threading.Lock()
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(names, values, extra=None):
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(f'{extra[0]}="{extra[1]}"')
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=('client',)):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        _REGISTRY.append(self)
+
+    def _key(self, labels):
+        if 'client' in self.labelnames and 'client' not in labels:
+            labels = dict(labels, client=current_client.get())
+        return tuple(labels.get(name, '') for name in self.labelnames)
+
+    def _samples(self):
+        for key, value in self._values.items():
+            yield self.name, key, None, value
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        for name, key, extra, value in self._samples():
+            lines.append(f"{name}{_format_labels(self.labelnames, key, extra)} {_format_value(value)}")
+        return lines
+
+
+class Counter(_Metric):
+    kind = 'counter'
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with _LOCK:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(_Metric):
+    kind = 'gauge'
+
+    def set(self, value, **labels):
+        key = self._key(labels)
+        with _LOCK:
+            self._values[key] = value
+
+
+class Histogram(_Metric):
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=('client',), buckets=LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets) + (float('inf'),)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with _LOCK:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [[0] * len(self.buckets), 0.0, 0]
+            for idx, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state[0][idx] += 1
+            state[1] += value
+            state[2] += 1
+
+    def _samples(self):
+        for key, (counts, total, count) in self._values.items():
+            for bound, bucket_count in zip(self.buckets, counts):
+                yield f"{self.name}_bucket", key, ('le', _format_value(float(bound))), bucket_count
+            yield f"{self.name}_sum", key, None, total
+            yield f"{self.name}_count", key, None, count
+
+
+# ── 지표 정의 ──
+
+API_CALLS = Counter('meta_api_calls_total', 'Graph API 호출 수', ('client', 'result'))
+API_LATENCY = Histogram('meta_api_call_duration_seconds', 'Graph API 호출 지연시간')
+API_USAGE = Gauge('meta_api_usage_percent', '응답 헤더 기준 최대 API 사용률', ('client', 'token'))
+API_RETRIES = Counter('meta_api_retries_total', '한도 초과 재시도 횟수')
+API_RETRY_SLEEP = Counter('meta_api_retry_sleep_seconds_total', '한도 초과 재시도 대기 시간')
+API_THROTTLE_SLEEP = Counter('meta_api_throttle_sleep_seconds_total', '토큰 버킷 대기 시간')
+ROWS_FETCHED = Counter('meta_rows_fetched_total', '수집한 인사이트 행 수', ('client', 'kind'))
+ANALYSIS_CPU = Counter('meta_analysis_cpu_seconds_total', 'analyze_meta_ads 프로세스 CPU 시간')
+DELIVERY_LATENCY = Histogram('discord_delivery_duration_seconds', 'Discord 전송 지연시간')
+DELIVERY_FAILURES = Counter('discord_delivery_failures_total', 'Discord 전송 실패 수')
+LAST_DELIVERY = Gauge('meta_report_last_delivery_timestamp_seconds', '마지막 보고서 전송 성공 시각')
+
+
+# ── 컨텍스트 전파 ──
+
+def submit_in_context(executor, fn, *args):
+    """현재 컨텍스트(광고주 라벨 포함)를 복사해 작업 제출"""
+    return executor.submit(contextvars.copy_context().run, fn, *args)
+
+
+def map_in_context(executor, fn, items):
+    """executor.map과 같되 현재 컨텍스트를 유지 (입력 순서대로 결과 반환)"""
+    futures = [submit_in_context(executor, fn, item) for item in items]
+    return [future.result() for future in futures]
+
+
+# ── 내보내기 ──
+
+def render():
+    """전체 지표를 Prometheus 텍스트 포맷으로 렌더링"""
+    with _LOCK:
+        lines = [line for metric in _REGISTRY for line in metric.render()]
+    return "\n".join(lines) + "\n"
+
+
+def write_textfile(path):
+    """textfile collector용 파일 쓰기 (임시 파일 → rename)"""
+    atomic_write(path, lambda f: f.write(render()))
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split('?')[0] != '/metrics':
+            self.send_error(404)
+            return
+        body = render().encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', CONTENT_TYPE)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def serve_metrics(port, host='127.0.0.1'):
+    """백그라운드 스레드로 /metrics 엔드포인트 실행"""
+    server = ThreadingHTTPServer((host, port), _MetricsHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server
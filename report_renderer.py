@@ -0,0 +1,241 @@
+# -*- coding: utf-8 -*-
+"""
+보고서 렌더러 (Discord 마크다운 / Slack 블록 / HTML / 텍스트)
+
+분석 결과를 섹션 단위로 렌더링한 뒤 한 번의 join으로 조립한다.
+포맷별 템플릿은 최초 사용 시 한 번만 컴파일해 재사용한다.
+"""
+
+import html
+import json
+import re
+from collections import OrderedDict
+from dataclasses import astuple
+from functools import lru_cache
+
+# 플랫폼별 메시지 길이 제한 (None = 제한 없음)
+PLATFORM_LIMITS = {
+    'discord': 2000,
+    'slack': 3000,
+    'html': None,
+    'text': None,
+}
+
+DIVIDER = "━" * 40
+
+_BOLD_PATTERN = re.compile(r'\*\*(.+?)\*\*')
+
+TEMPLATES = {
+    'discord': {
+        'header': "🚀 **{client_name} 주간 소재 성과 분석 리포트**\n\n**분석기간: {analysis_period}**\n\n{divider}\n\n",
+        'section_title': "**{title}**\n\n",
+        'item': "{idx}) {ad_name}\n- {metrics}\n\n",
+        'empty': "(저효율 소재 없음)\n\n",
+        'footer': "{divider}\n\n💡 **종합 분석 의견**\n\n{expert_analysis}\n",
+        'bold': r'**\1**',
+    },
+    'slack': {
+        'header': "🚀 *{client_name} 주간 소재 성과 분석 리포트*\n\n*분석기간: {analysis_period}*\n\n{divider}\n\n",
+        'section_title': "*{title}*\n\n",
+        'item': "{idx}) {ad_name}\n• {metrics}\n\n",
+        'empty': "(저효율 소재 없음)\n\n",
+        'footer': "{divider}\n\n💡 *종합 분석 의견*\n\n{expert_analysis}\n",
+        'bold': r'*\1*',
+    },
+    'html': {
+        'header': "<h2>🚀 {client_name} 주간 소재 성과 분석 리포트</h2>\n<p><strong>분석기간: {analysis_period}</strong></p>\n<hr>\n",
+        'section_title': "<h3>{title}</h3>\n",
+        'item': "<p>{idx}) {ad_name}<br>\n- {metrics}</p>\n",
+        'empty': "<p>(저효율 소재 없음)</p>\n",
+        'footer': "<hr>\n<h3>💡 종합 분석 의견</h3>\n<p>{expert_analysis}</p>\n",
+        'bold': r'<strong>\1</strong>',
+    },
+    'text': {
+        'header': "{client_name} 주간 소재 성과 분석 리포트\n\n분석기간: {analysis_period}\n\n{divider}\n\n",
+        'section_title': "{title}\n\n",
+        'item': "{idx}) {ad_name}\n- {metrics}\n\n",
+        'empty': "(저효율 소재 없음)\n\n",
+        'footer': "{divider}\n\n종합 분석 의견\n\n{expert_analysis}\n",
+        'bold': r'\1',
+    },
+}
+
+# (포맷, 광고주, 분석기간, 지문) → 렌더링 결과
+_RENDER_CACHE = OrderedDict()
+_RENDER_CACHE_SIZE = 64
+
+
+def _slack_escape(text):
+    """Slack mrkdwn 제어문자(&, <, >) 이스케이프"""
+    return text.replace('&', '&amp;').replace('<', '&lt;').replace('>', '&gt;')
+
+
+def format_money(amount):
+    """금액을 만원 단위로 포맷팅"""
+    if amount >= 10000:
+        return f"{amount/10000:.1f}만원"
+    else:
+        return f"{int(amount)}원"
+
+
+@lru_cache(maxsize=None)
+def get_templates(fmt):
+    """포맷별 템플릿 컴파일 (format 바운드 메서드로 1회 변환)"""
+    if fmt not in TEMPLATES:
+        raise ValueError(f"지원하지 않는 보고서 포맷: {fmt} (가능: {', '.join(TEMPLATES)})")
+    spec = TEMPLATES[fmt]
+    compiled = {key: value.format for key, value in spec.items() if key != 'bold'}
+    compiled['bold'] = spec['bold']
+    compiled['escape'] = {'html': html.escape, 'slack': _slack_escape}.get(fmt, str)
+    return compiled
+
+
+def format_metrics(m):
+    """소재별 지표 문자열 (구분자 ' / ', m: AdMetrics)"""
+    parts = [f"{format_money(m.spend)} 지출"]
+
+    if m.purchases > 0:
+        parts.append(f"매출 {format_money(m.revenue)}")
+        parts.append(f"구매 {int(m.purchases)}건")
+        parts.append(f"ROAS: {int(m.roas)}%")
+        parts.append(f"구매CPA: {format_money(m.cpa_purchase)}")
+    else:
+        parts.append("구매 미발생")
+
+    if m.registrations > 0:
+        parts.append(f"회원가입CPA: {format_money(m.cpa_registration)}")
+
+    return " / ".join(parts)
+
+
+def _render_expert(expert_analysis, tpl):
+    """종합 분석 의견의 Discord 굵게(**) 표기를 대상 포맷으로 변환"""
+    text = tpl['escape'](expert_analysis)
+    text = _BOLD_PATTERN.sub(tpl['bold'], text)
+    if tpl['escape'] is html.escape:
+        text = text.replace("\n", "<br>\n")
+    return text
+
+
+def _render_material_section(title, low_list, tpl):
+    esc = tpl['escape']
+    parts = [tpl['section_title'](title=title)]
+    if low_list:
+        item = tpl['item']
+        parts.extend(
+            item(idx=idx, ad_name=esc(m.ad_name), metrics=esc(format_metrics(m)))
+            for idx, m in enumerate(low_list, 1)
+        )
+    else:
+        parts.append(tpl['empty']())
+    return "".join(parts)
+
+
+def render_sections(client_name, analysis_period, da_low_list, va_low_list, expert_analysis, fmt='discord'):
+    """보고서를 섹션 리스트로 렌더링 (헤더 / DA / VA / 종합의견)"""
+    tpl = get_templates(fmt)
+    esc = tpl['escape']
+    return [
+        tpl['header'](client_name=esc(client_name), analysis_period=esc(analysis_period), divider=DIVIDER),
+        _render_material_section("1. DA", da_low_list, tpl),
+        _render_material_section("2. VA", va_low_list, tpl),
+        tpl['footer'](divider=DIVIDER, expert_analysis=_render_expert(expert_analysis, tpl)),
+    ]
+
+
+def _fingerprint(da_low_list, va_low_list, expert_analysis):
+    """렌더링에 쓰이는 전체 지표 값 (hash 충돌로 다른 보고서가 섞이지 않도록 값 자체를 키로 사용)"""
+    return (
+        expert_analysis,
+        tuple(astuple(m) for m in da_low_list),
+        tuple(astuple(m) for m in va_low_list),
+    )
+
+
+def _cached_sections(client_name, analysis_period, da_low_list, va_low_list, expert_analysis, fmt):
+    key = (fmt, client_name, analysis_period, _fingerprint(da_low_list, va_low_list, expert_analysis))
+    sections = _RENDER_CACHE.get(key)
+    if sections is not None:
+        _RENDER_CACHE.move_to_end(key)
+        return sections
+
+    sections = render_sections(client_name, analysis_period, da_low_list, va_low_list, expert_analysis, fmt)
+    _RENDER_CACHE[key] = sections
+    if len(_RENDER_CACHE) > _RENDER_CACHE_SIZE:
+        _RENDER_CACHE.popitem(last=False)
+    return sections
+
+
+def render_report(client_name, analysis_period, da_low_list, va_low_list, expert_analysis, fmt='discord'):
+    """보고서 전체를 하나의 문자열로 렌더링"""
+    return "".join(_cached_sections(client_name, analysis_period, da_low_list, va_low_list, expert_analysis, fmt))
+
+
+def _split_oversized(section, limit):
+    """
+    제한을 넘는 섹션을 줄 단위 조각으로 분할 (한 줄이 제한을 넘으면 강제 절단)
+
+    조각을 미리 limit 크기로 묶지 않고 줄 단위로 넘겨, pack_sections가 앞 청크(헤더 등)의
+    남은 공간부터 채우도록 한다.
+    """
+    pieces = []
+    for line in section.splitlines(keepends=True):
+        while len(line) > limit:
+            pieces.append(line[:limit])
+            line = line[limit:]
+        if line:
+            pieces.append(line)
+    return pieces
+
+
+def pack_sections(sections, limit):
+    """섹션을 순서대로 묶어 각 청크가 limit 이하가 되도록 분할 (선형 시간)"""
+    if not limit:
+        return ["".join(sections)]
+
+    chunks = []
+    current = []
+    size = 0
+    for section in sections:
+        pieces = [section] if len(section) <= limit else _split_oversized(section, limit)
+        for piece in pieces:
+            if size + len(piece) > limit and current:
+                chunks.append("".join(current))
+                current, size = [], 0
+            current.append(piece)
+            size += len(piece)
+    if current:
+        chunks.append("".join(current))
+    return chunks
+
+
+def render_report_chunks(client_name, analysis_period, da_low_list, va_low_list, expert_analysis,
+                         fmt='discord', limit=None):
+    """플랫폼 길이 제한에 맞춰 섹션 경계로 나눈 메시지 리스트"""
+    if limit is None:
+        limit = PLATFORM_LIMITS.get(fmt)
+    sections = _cached_sections(client_name, analysis_period, da_low_list, va_low_list, expert_analysis, fmt)
+    return pack_sections(sections, limit)
+
+
+def render_slack_blocks(client_name, analysis_period, da_low_list, va_low_list, expert_analysis):
+    """Slack Block Kit 페이로드용 블록 리스트 (섹션당 mrkdwn 3000자 제한 준수)"""
+    blocks = []
+    for chunk in render_report_chunks(client_name, analysis_period, da_low_list, va_low_list,
+                                      expert_analysis, fmt='slack'):
+        blocks.append({'type': 'section', 'text': {'type': 'mrkdwn', 'text': chunk}})
+    return blocks
+
+
+def render_result(result, fmt='discord', client_name=None):
+    """analyze_meta_ads 결과 dict를 지정 포맷으로 렌더링 (slack은 블록 JSON 문자열)"""
+    args = (
+        client_name or result.get('client_name', '광고주'),
+        result.get('analysis_period', ''),
+        result.get('da_low', []),
+        result.get('va_low', []),
+        result.get('expert_analysis', ''),
+    )
+    if fmt == 'slack':
+        return json.dumps({'blocks': render_slack_blocks(*args)}, ensure_ascii=False)
+    return render_report(*args, fmt=fmt)
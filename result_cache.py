@@ -0,0 +1,86 @@
+# -*- coding: utf-8 -*-
+"""
+analyze_meta_ads 결과 캐시 (광고주 설정 해시 + 분석기간 기준, TTL)
+
+Discord 전송 실패나 웹훅 수정 후 재실행할 때 같은 D7 구간을 다시 분석하지 않고
+저장된 결과(보고서 텍스트, 저효율 리스트, df_grouped, df_raw)를 그대로 재사용한다.
+"""
+
+import hashlib
+import json
+import os
+import pickle
+import time
+
+from analysis_engine import analyze_meta_ads, get_analysis_window, get_reference_time
+from utils import atomic_write
+
+CACHE_DIR = os.environ.get('META_REPORT_CACHE_DIR', os.path.join('.cache', 'results'))
+DEFAULT_TTL = 6 * 60 * 60  # 6시간
+
+# 결과 구조가 바뀌면 올려서 이전 캐시를 무효화 (2: da_low/va_low가 AdMetrics 리스트, 3: df_raw 추가, 4: 일별 df_raw + reallocation)
+RESULT_SCHEMA_VERSION = 4
+
+# 분석 결과에 영향을 주지 않는 설정값 (변경돼도 캐시 유지)
+NON_ANALYSIS_KEYS = ('discord_webhook', 'access_token', 'access_tokens')
+
+
+def config_hash(config):
+    """분석에 영향을 주는 설정값만으로 만든 해시"""
+    relevant = {k: v for k, v in config.items() if k not in NON_ANALYSIS_KEYS}
+    raw = json.dumps(relevant, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+
+def cache_key(config):
+    """설정 해시 + 분석기간으로 캐시 키 생성"""
+    start_date, end_date = get_analysis_window(get_reference_time(config))
+    period = f"{start_date.strftime('%Y%m%d')}-{end_date.strftime('%Y%m%d')}"
+    return f"{period}_v{RESULT_SCHEMA_VERSION}_{config_hash(config)[:24]}"
+
+
+def _cache_path(key):
+    return os.path.join(CACHE_DIR, f"{key}.pkl")
+
+
+def load_result(key, ttl=DEFAULT_TTL):
+    """TTL 이내의 캐시 결과 반환 (없거나 만료/손상 시 None, ttl=None이면 만료 없음)"""
+    path = _cache_path(key)
+    try:
+        if ttl is not None and time.time() - os.path.getmtime(path) > ttl:
+            return None
+        with open(path, 'rb') as f:
+            return pickle.load(f)
+    except (OSError, pickle.UnpicklingError, EOFError):
+        return None
+
+
+def save_result(key, result):
+    """결과 저장 (임시 파일 → rename으로 원자적 교체)"""
+    atomic_write(_cache_path(key), lambda f: pickle.dump(result, f, protocol=pickle.HIGHEST_PROTOCOL), 'wb')
+
+
+def analyze_with_cache(config, progress_callback=None, use_cache=True, ttl=DEFAULT_TTL):
+    """
+    캐시를 거쳐 analyze_meta_ads 실행
+
+    use_cache=False면 캐시 조회를 건너뛰고 새로 분석한 결과로 캐시를 갱신한다.
+    에러 결과는 저장하지 않는다.
+    """
+    key = cache_key(config)
+
+    if use_cache:
+        cached = load_result(key, ttl)
+        if cached is not None:
+            if progress_callback:
+                progress_callback(f"캐시된 분석 결과 사용 ({key})")
+            return cached
+
+    result = analyze_meta_ads(config, progress_callback=progress_callback)
+    if not result.get('error'):
+        try:
+            save_result(key, result)
+        except OSError as e:
+            if progress_callback:
+                progress_callback(f"분석 결과 캐시 저장 실패: {e}")
+    return result
@@ -2,16 +2,59 @@
 """
 Meta 저효율 광고 분석 → Discord 전송 실행 스크립트
 
-사용법: python run_report.py
+사용법: python run_report.py [--no-cache] [--restart] [--metrics-file PATH] [--export-dir DIR]
+                            [--record PATH | --replay PATH [--replay-latency]]
+
+  --no-cache   저장된 분석 결과를 무시하고 미전송 광고주 재분석
+  --restart    실행 저널을 초기화하고 전송 완료 광고주까지 처음부터 다시 실행
+  --record     모든 API 호출을 PATH에 녹화 (캐시/저널 미사용)
+  --replay     PATH의 녹화본으로 오프라인 재현 (Discord 전송 없이 보고서 출력)
+  --metrics-file  광고주 처리마다 운영 지표를 PATH에 기록 (node_exporter textfile collector용)
+  --export-dir    원본 인사이트/소재 집계를 DIR에 Arrow IPC + Parquet로 저장 (pyarrow 필요)
+
+중단된 실행을 다시 시작하면 이미 전송된 광고주는 건너뛰고 남은 광고주만 이어서 처리한다.
 """
 
 import json
 import sys
-from analysis_engine import analyze_meta_ads
+import time
+from analysis_engine import get_analysis_window, get_reference_time
+from cassette import cassette_from_argv
+from columnar_export import export_result
+from meta_api import use_cassette
+from metrics import LAST_DELIVERY, current_client, write_textfile
+from report_renderer import render_report_chunks
+from result_cache import DEFAULT_TTL, analyze_with_cache, cache_key
+from run_state import RunJournal
 from send_to_discord import send_report
+from utils import option_from_argv
 
 
 def main():
+    cassette, argv = cassette_from_argv(sys.argv[1:])
+    metrics_file, argv = option_from_argv(argv, '--metrics-file')
+    export_dir, argv = option_from_argv(argv, '--export-dir')
+    use_cache = '--no-cache' not in argv and cassette is None
+    restart = '--restart' in argv
+    replaying = cassette is not None and not cassette.recording
+
+    if cassette is not None:
+        use_cassette(cassette)
+        print(f"[{'REPLAY' if replaying else 'RECORD'}] {cassette.path}\n")
+
+    try:
+        run(use_cache=use_cache, restart=restart, cassette=cassette, metrics_file=metrics_file,
+            export_dir=export_dir)
+    finally:
+        if cassette is not None:
+            cassette.close()
+        if metrics_file:
+            write_textfile(metrics_file)
+
+
+def run(use_cache=True, restart=False, cassette=None, metrics_file=None, export_dir=None):
+    replaying = cassette is not None and not cassette.recording
+
     # 1. clients.json 로드
     try:
         with open('clients.json', 'r', encoding='utf-8') as f:
@@ -24,38 +67,104 @@ def main():
         print("ERROR: clients.json에 등록된 광고주가 없습니다.")
         sys.exit(1)
 
+    as_of = cassette.recorded_at if replaying else None
+    start_date, end_date = get_analysis_window(get_reference_time({'as_of': as_of}))
+    run_id = f"{start_date.strftime('%Y%m%d')}-{end_date.strftime('%Y%m%d')}"
+    if cassette is not None:
+        # 녹화/재생은 매번 전 광고주를 실제 호출 경로로 실행 (저널은 메모리에만 유지)
+        journal = RunJournal(run_id, path=None)
+    else:
+        journal = RunJournal.load(run_id, restart=restart)
+
     print(f"=== Meta 저효율 광고 분석 시작 ({len(clients)}개 광고주) ===\n")
 
+    done = journal.summary()['delivered']
+    if done:
+        print(f"[RESUME] {run_id} 실행 이어서 진행 (전송 완료 {done}개 광고주 건너뜀)\n")
+
     # 2. 각 광고주별 분석 + 전송
     for client_name, config in clients.items():
-        print(f"--- {client_name} ---")
+        if metrics_file:
+            write_textfile(metrics_file)
+        current_client.set(client_name)
         config['client_name'] = client_name
+        if cassette is not None:
+            config['campaign_cache'] = False
+        if as_of:
+            config['as_of'] = as_of
 
-        # 분석 실행
-        try:
-            result = analyze_meta_ads(config, progress_callback=print)
-        except Exception as e:
-            print(f"[ERROR] {client_name} 분석 실패: {e}")
-            continue
-
-        if result.get('error'):
-            print(f"[SKIP] {client_name}: {result['error']}")
+        if journal.reached(client_name, 'delivered'):
             continue
 
-        report_text = result.get('report_text', '')
-        if not report_text:
-            print(f"[SKIP] {client_name}: 보고서 내용 없음")
-            continue
+        print(f"--- {client_name} ---")
+        webhook_url = config.get('discord_webhook', '')
+        result = None
+
+        if journal.stage(client_name) and journal.get(client_name, 'cache_key') != cache_key(config):
+            # 같은 분석기간 안에서 설정(기준값, 타겟 캠페인 등)이 바뀜 → 저장된 결과/메시지 폐기
+            print(f"[RESTART] {client_name}: 설정 변경 감지, 처음부터 다시 진행")
+            journal.reset(client_name)
+
+        if use_cache and journal.reached(client_name, 'analyzed'):
+            # 렌더링까지 끝난 광고주: 저장된 메시지로 전송만 재시도
+            chunks = journal.get(client_name, 'chunks', [])
+            sent = journal.get(client_name, 'sent_chunks', 0)
+            print(f"[RESUME] {client_name}: 저장된 보고서로 전송 재시도 ({sent}/{len(chunks)}개 전송됨)")
+        else:
+            # 분석 실행 (fetched 단계면 만료와 무관하게 저장된 결과 재사용)
+            resume_fetched = use_cache and journal.reached(client_name, 'fetched')
+            try:
+                result = analyze_with_cache(
+                    config, progress_callback=print, use_cache=use_cache,
+                    ttl=None if resume_fetched else DEFAULT_TTL
+                )
+            except Exception as e:
+                print(f"[ERROR] {client_name} 분석 실패: {e}")
+                continue
+
+            if result.get('error'):
+                print(f"[SKIP] {client_name}: {result['error']}")
+                continue
+
+            report_text = result.get('report_text', '')
+            if not report_text:
+                print(f"[SKIP] {client_name}: 보고서 내용 없음")
+                continue
+
+            journal.mark(client_name, 'fetched', cache_key=cache_key(config))
+
+            if export_dir:
+                try:
+                    paths = export_result(result, export_dir, end_date)
+                    print(f"[EXPORT] {client_name}: {len(paths)}개 파일 저장")
+                except Exception as e:
+                    print(f"[EXPORT] {client_name} 내보내기 실패: {e}")
+
+            chunks = render_report_chunks(
+                client_name, result['analysis_period'], result['da_low'], result['va_low'],
+                result['expert_analysis'], fmt='discord'
+            )
+            journal.mark(client_name, 'analyzed', chunks=chunks, sent_chunks=0)
+            sent = 0
 
         # Discord 전송
-        webhook_url = config.get('discord_webhook', '')
-        if not webhook_url:
-            print(f"[SKIP] {client_name}: Discord 웹훅 URL 미설정")
-            print(report_text)
+        if replaying or not webhook_url:
+            print(f"[SKIP] {client_name}: {'재생 모드' if replaying else 'Discord 웹훅 URL 미설정'}")
+            print("".join(chunks))
             continue
 
-        success, msg = send_report(webhook_url, report_text)
+        success, msg = send_report(
+            webhook_url, chunks, start=sent,
+            on_sent=lambda count: journal.update(client_name, sent_chunks=count)
+        )
         print(f"[{'OK' if success else 'FAIL'}] {client_name}: {msg}")
+        if success:
+            journal.mark(client_name, 'delivered')
+            LAST_DELIVERY.set(time.time())
+
+        if result is None:
+            print()
+            continue
 
         # 전체 계정 집계 출력
         df = result.get('df_grouped')
@@ -79,7 +188,8 @@ def main():
 
         print()
 
-    print("=== 완료 ===")
+    counts = journal.summary()
+    print(f"=== 완료 (전송 {counts['delivered']}/{len(clients)}개 광고주) ===")
 
 
 if __name__ == '__main__':
@@ -0,0 +1,96 @@
+# -*- coding: utf-8 -*-
+"""
+run_report 실행 저널 (광고주별 단계 체크포인트)
+
+단계:
+  fetched    분석 결과(df_grouped 포함)가 결과 캐시에 저장됨
+  analyzed   전송할 보고서 메시지가 렌더링되어 저널에 저장됨 (sent_chunks: 전송 완료 메시지 수)
+  delivered  Discord 전송 완료
+
+중간에 중단된 실행을 다시 시작하면 delivered 광고주는 건너뛰고,
+나머지는 마지막으로 완료된 단계 다음부터 이어서 진행한다.
+저장된 cache_key(설정 해시 + 분석기간)가 현재 설정과 다르면 해당 광고주는 처음부터 다시 진행한다.
+"""
+
+import json
+import os
+from datetime import datetime
+
+from utils import atomic_write
+
+STATE_PATH = os.environ.get('META_REPORT_STATE_PATH', os.path.join('.cache', 'run_state.json'))
+
+STAGES = ('fetched', 'analyzed', 'delivered')
+
+
+class RunJournal:
+    """분석기간(run_id) 단위 광고주별 진행 상태"""
+
+    def __init__(self, run_id, clients=None, path=STATE_PATH):
+        self.run_id = run_id
+        self.clients = clients or {}
+        self.path = path
+
+    @classmethod
+    def load(cls, run_id, path=STATE_PATH, restart=False):
+        """
+        저장된 저널 로드
+
+        run_id(분석기간)가 다르거나 restart=True면 빈 저널로 새로 시작한다.
+        """
+        if not restart:
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+                if data.get('run_id') == run_id:
+                    return cls(run_id, data.get('clients', {}), path)
+            except (OSError, ValueError):
+                pass
+        return cls(run_id, path=path)
+
+    def stage(self, client_name):
+        """마지막으로 완료된 단계 (없으면 None)"""
+        return self.clients.get(client_name, {}).get('stage')
+
+    def reached(self, client_name, stage):
+        """해당 단계 이상 완료 여부"""
+        current = self.stage(client_name)
+        return current is not None and STAGES.index(current) >= STAGES.index(stage)
+
+    def get(self, client_name, key, default=None):
+        return self.clients.get(client_name, {}).get(key, default)
+
+    def mark(self, client_name, stage, **data):
+        """단계 완료 기록 후 즉시 저장"""
+        if stage not in STAGES:
+            raise ValueError(f"알 수 없는 단계: {stage}")
+        entry = self.clients.setdefault(client_name, {})
+        entry.update(data)
+        entry['stage'] = stage
+        entry['updated_at'] = datetime.now().isoformat(timespec='seconds')
+        self.save()
+
+    def update(self, client_name, **data):
+        """단계 변경 없이 데이터만 기록 후 저장 (전송 진행 상황 등)"""
+        self.clients.setdefault(client_name, {}).update(data)
+        self.save()
+
+    def reset(self, client_name):
+        """광고주 진행 상태 삭제 (처음부터 다시 진행)"""
+        if self.clients.pop(client_name, None) is not None:
+            self.save()
+
+    def save(self):
+        """임시 파일 → rename으로 원자적 저장"""
+        if not self.path:
+            return
+        data = {'run_id': self.run_id, 'clients': self.clients}
+        atomic_write(self.path, lambda f: json.dump(data, f, ensure_ascii=False, indent=2))
+
+    def summary(self):
+        """단계별 광고주 수"""
+        counts = {stage: 0 for stage in STAGES}
+        for entry in self.clients.values():
+            if entry.get('stage') in counts:
+                counts[entry['stage']] += 1
+        return counts
@@ -3,26 +3,84 @@
 디스코드 웹훅으로 보고서 전송 (파라미터화)
 """
 
+import time
+
 import requests
 
+from metrics import DELIVERY_FAILURES, DELIVERY_LATENCY
+
+MAX_RATE_LIMIT_RETRIES = 3   # HTTP 429 수신 시 같은 메시지 재시도 횟수
+DEFAULT_RETRY_AFTER = 1.0    # Retry-After가 없을 때 대기 (초)
 
-def send_report(webhook_url, report_text):
+
+def send_report(webhook_url, report_text, start=0, on_sent=None):
     """
     디스코드로 보고서 전송
 
     Args:
         webhook_url: 디스코드 웹훅 URL
-        report_text: 전송할 보고서 텍스트
+        report_text: 전송할 보고서 텍스트, 또는 2000자 이하로 나눈 메시지 리스트
+                     (report_renderer.render_report_chunks 결과)
+        start: 메시지 리스트 중 이미 전송된 개수 (이어서 전송할 때)
+        on_sent: 메시지 1개 전송 성공마다 전송 완료 개수로 호출
+
+    웹훅 호출 한도(HTTP 429)에 걸리면 Retry-After만큼 기다려 같은 메시지를 다시 보내고,
+    버킷 잔여 요청이 0이면 다음 메시지 전에 리셋 시간까지 기다린다.
 
     Returns:
         (success: bool, message: str)
     """
+    started = time.monotonic()
+    success, message = _send_report(webhook_url, report_text, start, on_sent)
+    DELIVERY_LATENCY.observe(time.monotonic() - started)
+    if not success:
+        DELIVERY_FAILURES.inc()
+    return success, message
+
+
+def _retry_after(response):
+    """429 응답의 재시도 대기 시간(초): Retry-After 헤더 → 본문 retry_after 순"""
+    for value in (response.headers.get('Retry-After'), _json_field(response, 'retry_after')):
+        try:
+            return max(float(value), 0.0)
+        except (TypeError, ValueError):
+            continue
+    return DEFAULT_RETRY_AFTER
+
+
+def _json_field(response, name):
+    try:
+        return response.json().get(name)
+    except (ValueError, AttributeError):
+        return None
+
+
+def _pace(response):
+    """웹훅 버킷 잔여 요청이 0이면 리셋될 때까지 대기 (다음 메시지가 429를 받지 않도록)"""
+    if response.headers.get('X-RateLimit-Remaining') != '0':
+        return
+    try:
+        time.sleep(max(float(response.headers.get('X-RateLimit-Reset-After', 0)), 0.0))
+    except (TypeError, ValueError):
+        pass
+
+
+def _send_report(webhook_url, report_text, start=0, on_sent=None):
     if not webhook_url:
         return False, "웹훅 URL이 설정되지 않았습니다."
 
     if not report_text:
         return False, "전송할 보고서 내용이 없습니다."
 
+    if isinstance(report_text, (list, tuple)):
+        for idx in range(start, len(report_text)):
+            success, msg = _send_report(webhook_url, report_text[idx])
+            if not success:
+                return False, f"{idx+1}/{len(report_text)}번째 메시지 {msg}"
+            if on_sent:
+                on_sent(idx + 1)
+        return True, f"보고서 전송 성공! ({len(report_text) - start}개 메시지)"
+
     # 2000자 이하면 일반 메시지, 초과시 embed 사용 (4096자까지)
     if len(report_text) <= 2000:
         payload = {"content": report_text}
@@ -35,9 +93,15 @@ def send_report(webhook_url, report_text):
         }
 
     try:
-        response = requests.post(webhook_url, json=payload)
+        for attempt in range(MAX_RATE_LIMIT_RETRIES + 1):
+            response = requests.post(webhook_url, json=payload)
+            if response.status_code != 429 or attempt == MAX_RATE_LIMIT_RETRIES:
+                break
+            # 웹훅 호출 한도 초과 → 안내된 시간만큼 기다린 뒤 같은 메시지 재전송
+            time.sleep(_retry_after(response))
 
         if response.status_code == 204:
+            _pace(response)
             return True, "보고서 전송 성공!"
         else:
             return False, f"전송 실패: HTTP {response.status_code} - {response.text}"
@@ -0,0 +1,126 @@
+# -*- coding: utf-8 -*-
+"""
+budget_simulator 결정적 테스트 (고정 시드 합성 데이터)
+
+실행: python -m pytest -q test_budget_simulator.py
+"""
+
+import time
+
+import pytest
+
+np = pytest.importorskip('numpy')
+pd = pytest.importorskip('pandas')
+
+from ad_metrics import AdMetrics
+from budget_simulator import (
+    DEFAULT_ELASTICITY, ELASTICITY_BOUNDS, MAX_SCALE, WEIGHT_EXPONENTS, fit_elasticity, simulate_reallocation,
+)
+
+TRUE_ELASTICITY = 0.6
+
+
+def make_account(seed=0, creatives=60, days=7, zero_every=5, elasticity=TRUE_ELASTICITY, spend_range=(5e4, 4e5)):
+    """revenue = a · spend^b 일별 데이터 (zero_every번째 소재는 매출 0) → (df_raw, df_grouped)"""
+    rng = np.random.default_rng(seed)
+    scale = rng.uniform(0.5, 3, creatives) * (1.5e5 ** (1 - elasticity))
+    rows = []
+    for i in range(creatives):
+        converting = i % zero_every != 0
+        for d in range(days):
+            spend = rng.uniform(*spend_range)
+            revenue = scale[i] * spend ** elasticity * rng.lognormal(0, 0.1) if converting else 0.0
+            rows.append({
+                'date_start': f"2026-10-{d + 1:02d}",
+                'ad_id': str(i),
+                'ad_name': f"ad{i}",
+                'material_type': 'DA' if i % 2 else 'VA',
+                'spend': spend,
+                'purchases': 1 if converting else 0,
+                'registrations': 0,
+                'revenue': revenue,
+            })
+    df_raw = pd.DataFrame(rows)
+    df_grouped = df_raw.groupby(['ad_name', 'material_type']).agg({
+        'spend': 'sum', 'purchases': 'sum', 'registrations': 'sum', 'revenue': 'sum'
+    }).reset_index()
+    df_grouped['roas'] = (df_grouped['revenue'] / df_grouped['spend'] * 100).round(0)
+    df_grouped['cpa_purchase'] = 0.0
+    df_grouped['cpa_registration'] = 0.0
+    return df_raw, df_grouped
+
+
+def low_performers(df_grouped, threshold=85):
+    return AdMetrics.from_frame(df_grouped[df_grouped['roas'] < threshold])
+
+
+@pytest.mark.parametrize('seed', [0, 1, 2, 3])
+def test_projected_spend_never_exceeds_baseline(seed):
+    df_raw, df_grouped = make_account(seed)
+    plan = simulate_reallocation(df_grouped, low_performers(df_grouped), df_raw)
+
+    assert plan is not None
+    assert plan.projected_spend <= plan.baseline_spend + 1e-6
+    assert plan.reallocated_spend <= plan.freed_spend + 1e-6
+    assert plan.projected_revenue >= plan.baseline_revenue - 1e-6
+
+
+@pytest.mark.parametrize('seed', [0, 1, 2, 3])
+def test_targets_capped_at_max_scale(seed):
+    df_raw, df_grouped = make_account(seed)
+    plan = simulate_reallocation(df_grouped, low_performers(df_grouped), df_raw)
+
+    assert plan.targets
+    low_names = {m.ad_name for m in low_performers(df_grouped)}
+    for ad_name, _, current, proposed in plan.targets:
+        assert ad_name not in low_names
+        assert current < proposed <= current * MAX_SCALE + 1e-6
+
+
+def test_none_without_low_performers():
+    df_raw, df_grouped = make_account()
+    assert simulate_reallocation(df_grouped, [], df_raw) is None
+
+
+def test_none_without_scale_candidates():
+    df_raw, df_grouped = make_account()
+    # 모든 소재가 저효율이면 증액할 후보가 없음
+    assert simulate_reallocation(df_grouped, AdMetrics.from_frame(df_grouped), df_raw) is None
+
+
+def test_fit_elasticity_recovers_pooled_exponent():
+    df_raw, _ = make_account()
+    assert fit_elasticity(df_raw) == pytest.approx(TRUE_ELASTICITY, abs=0.05)
+
+
+def test_flat_roas_still_has_diminishing_returns():
+    # 일별 ROAS가 일정한 계정도 증액분은 현재 ROAS보다 낮게 본다
+    df_raw, df_grouped = make_account(elasticity=1.0)
+    assert fit_elasticity(df_raw) == ELASTICITY_BOUNDS[1] < 1
+
+    plan = simulate_reallocation(df_grouped, low_performers(df_grouped), df_raw)
+    assert plan.elasticity < 1
+
+
+def test_fit_elasticity_shrinks_to_default_when_spend_barely_varies():
+    df_raw, _ = make_account(creatives=10, spend_range=(1.49e5, 1.51e5))
+    assert fit_elasticity(df_raw) == pytest.approx(DEFAULT_ELASTICITY, abs=0.05)
+
+
+def test_fit_elasticity_defaults_without_daily_history():
+    df_raw, _ = make_account(creatives=2, days=1)
+    assert fit_elasticity(df_raw) == DEFAULT_ELASTICITY
+    assert fit_elasticity(df_raw.drop(columns='date_start')) == DEFAULT_ELASTICITY
+
+
+def test_scenario_grid_runs_well_under_a_second():
+    df_raw, df_grouped = make_account()
+    low_list = low_performers(df_grouped)
+
+    started = time.perf_counter()
+    plan = simulate_reallocation(df_grouped, low_list, df_raw)
+    elapsed = time.perf_counter() - started
+
+    candidates = min(20, len(df_grouped) - len(low_list))
+    assert plan.scenario_count == 2 * candidates * len(WEIGHT_EXPONENTS)
+    assert elapsed < 1.0
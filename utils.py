@@ -0,0 +1,38 @@
+# -*- coding: utf-8 -*-
+"""
+실행 스크립트 / 캐시 모듈 공통 유틸 (CLI 옵션 추출, 원자적 파일 쓰기)
+"""
+
+import os
+
+
+def option_from_argv(argv, name):
+    """'--name VALUE' 옵션 값 추출 → (value or None, 해당 인자를 제거한 argv)"""
+    if name not in argv:
+        return None, list(argv)
+    idx = argv.index(name)
+    value = argv[idx + 1] if idx + 1 < len(argv) else None
+    return value, list(argv[:idx]) + list(argv[idx + 2:])
+
+
+def atomic_write(path, write, mode='w'):
+    """
+    임시 파일에 쓴 뒤 rename으로 원자적 교체 (중간에 실패해도 기존 파일 유지)
+
+    write: 열린 임시 파일 객체를 받아 내용을 쓰는 함수
+    mode: 'w'(UTF-8 텍스트) 또는 'wb'(바이너리)
+    """
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        with open(tmp_path, mode, encoding=None if 'b' in mode else 'utf-8') as f:
+            write(f)
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise